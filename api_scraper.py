@@ -1,198 +1,195 @@
-import requests
-import sqlite3
 from datetime import datetime
+import argparse
 import logging
 import os
-import time
-import re
-import html
+import sys
+from aramark_api import THROTTLE_STATUSES, APIError, fetch_descriptions, iter_listing_pages
+from database import (load_job_hashes, load_missing_descriptions, pending_descriptions, queue_descriptions,
+                      record_description_failures, record_run, setup_database, sync_jobs, update_descriptions)
+from exporter import export_jobs
+from facility_extractor import FacilityExtractor, extract_many
+from facility_catalog import sync_facilities
+from facility_matcher import CachedMatcher, FacilityMatcher
+from html_cleaner import CLEANER_VERSION, clean_html
+from metrics import PhaseTimer, setup_logging
+from profiling import add_profile_arguments, run_with_profiling
 
 # Setup logging
-log_dir = 'logs'
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-log_file = os.path.join(log_dir, f'api_scraper_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
+log_file = setup_logging('api_scraper')
 logger = logging.getLogger(__name__)
 
-def load_master_facilities():
-    facilities = []
-    with open('clean_prisons.txt', 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line and ':' not in line and len(line) > 5:
-                facilities.append(line)
-    return facilities
-
-def find_best_match(facility_name, master_list):
-    from difflib import SequenceMatcher
-    best_match = None
-    best_score = 0
-    
-    for master_facility in master_list:
-        score = SequenceMatcher(None, facility_name.lower(), master_facility.lower()).ratio()
-        if score > best_score and score > 0.7:
-            best_score = score
-            best_match = master_facility
-    
-    return best_match, best_score
+# Listing pagination: jobs per page, pages in flight, requests per second
+LISTING_PAGE_SIZE = int(os.environ.get('LISTING_PAGE_SIZE', 100))
+LISTING_WORKERS = int(os.environ.get('LISTING_WORKERS', 4))
+LISTING_RATE = float(os.environ.get('LISTING_RATE', 4))
 
-def clean_html(text):
-    if not text:
-        return text
-    text = html.unescape(text)
-    text = re.sub(r'<[^>]+>', '', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+# Description fetch concurrency and request rate (requests per second)
+DESCRIPTION_WORKERS = int(os.environ.get('DESCRIPTION_WORKERS', 8))
+DESCRIPTION_RATE = float(os.environ.get('DESCRIPTION_RATE', 8))
 
-def extract_facility_name(title):
-    
-    if ' - ' in title:
-        after_dash = title.split(' - ', 1)[1]
-        after_dash = re.sub(r'\s*-\s*\([^)]+\)$', '', after_dash)
-        after_dash = re.sub(r'\s*-\s*(?!DC)[A-Z]{2}(/[A-Z]{2})?\s*-\s*\([^)]+\)$', '', after_dash)
-        after_dash = re.sub(r'\bDC\b', 'Detention Center', after_dash)
-        return after_dash.strip()
-    
-    patterns = [
-        r'([A-Za-z\s]+County\s+(?:Jail|Sheriff|Detention|Correctional)[^,]*)',
-        r'([A-Za-z\s]+(?:Jail|Prison|Correctional|Detention)(?:\s+(?:Facility|Center|Institution))?)',
-        r'([A-Za-z\s]+(?:Penitentiary|Institution))',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, title, re.IGNORECASE)
-        if match:
-            result = match.group(1).strip()
-            result = re.sub(r'\bDC\b', 'Detention Center', result)
-            return result
-    
-    return None
+# Fetched descriptions are saved, and taken off the queue, in batches of
+# this many per transaction
+DESCRIPTION_BATCH_SIZE = 25
 
-def setup_database():
-    conn = sqlite3.connect('jobs.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS jobs (
-        job_id TEXT PRIMARY KEY,
-        title TEXT,
-        url TEXT,
-        location TEXT,
-        posted_date DATE,
-        description TEXT,
-        facility_name_raw TEXT,
-        facility_name_standard TEXT,
-        verified_facility BOOLEAN
-    )
-    ''')
-    conn.commit()
-    return conn
+def now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
 def scrape_all_jobs():
+    timer = PhaseTimer()
+    started_at = now()
     conn = setup_database()
     cursor = conn.cursor()
     
     logger.info("Starting API job scraper")
     
-    master_facilities = load_master_facilities()
-    logger.info(f"Loaded {len(master_facilities)} master facilities")
-    
-    # Get all jobs
-    url = "https://careers.aramark.com/wp-json/aramark/jobs?&path=&zips=&industries=correctional%20facilities&categories=&jobfunction=&sub_categories=&types=&keyword=&limit=500"
-    
-    logger.info("Fetching jobs from API...")
-    response = requests.get(url)
+    with conn:
+        catalog_hash, changes = sync_facilities(conn, updated_at=started_at)
+    if changes:
+        added, updated, removed = changes
+        logger.info(f"Facility catalog rebuilt from prisons.txt: {added} added, {updated} updated, {removed} removed")
+    matcher = CachedMatcher(conn, catalog_hash)
+    logger.info(f"Loaded {len(matcher.names)} catalog facilities")
     
-    if response.status_code != 200:
-        logger.error(f"API request failed with status {response.status_code}")
-        return
-    
-    jobs = response.json()
-    logger.info(f"Total jobs found: {len(jobs)}")
-    
-    new_jobs = 0
     updated_jobs = 0
+    failed_jobs = 0
+    
+    def drain_description_queue():
+        """Fetch every pending description on the queue. Each batch is
+        saved together with its queue updates, so an interrupted run
+        leaves only the unsaved jobs pending."""
+        nonlocal updated_jobs, failed_jobs
+        job_ids = [job_id for job_id, _, _, _ in pending_descriptions(conn)]
+        if not job_ids:
+            return
+        logger.info(f"Fetching descriptions for {len(job_ids)} queued jobs...")
+        descriptions = []
+        failures = []
+        
+        def flush():
+            with timer.phase('db_write'), conn:
+                update_descriptions(conn, descriptions, cleaned_version=CLEANER_VERSION, updated_at=started_at)
+                record_description_failures(conn, failures)
+            descriptions.clear()
+            failures.clear()
+        
+        # Fetch concurrently; the token bucket keeps us polite to the API
+        # Once the API throttles past the retries, the rest of the queue
+        # is not requested and stays pending
+        fetched = fetch_descriptions(job_ids, workers=DESCRIPTION_WORKERS, rate=DESCRIPTION_RATE)
+        throttled = False
+        for job_id, description, error in timer.timed(fetched, 'description_fetch'):
+            if error:
+                logger.error(f"Error getting description for {job_id}: {error}")
+                # Being throttled says nothing about the job, so it stays
+                # pending without using up an attempt
+                if isinstance(error, APIError) and error.status_code in THROTTLE_STATUSES:
+                    if not throttled:
+                        logger.warning("API is throttling description requests; leaving the rest of the queue for the next run")
+                    throttled = True
+                else:
+                    failures.append((job_id, error))
+                    failed_jobs += 1
+            elif description is None:
+                logger.error(f"No description returned for {job_id}")
+                failures.append((job_id, 'not found'))
+                failed_jobs += 1
+            else:
+                descriptions.append((job_id, clean_html(description)))
+                updated_jobs += 1
+                logger.info(f"Updated description for {job_id}")
+            if len(descriptions) + len(failures) >= DESCRIPTION_BATCH_SIZE:
+                flush()
+        flush()
     
-    new_job_ids = []
+    logger.info("Fetching jobs from API...")
     
-    for job in jobs:
-        req_id = job.get('req_id')
-        title = job.get('title')
-        url = job.get('url')
-        city = job.get('city', '')
-        state = job.get('state', '')
-        location = f"{city}, {state}".strip(', ')
-        posted_date = job.get('pub_date')
+    listed_rows = []
+    jobs_found = 0
+    known = load_job_hashes(conn)
+    seen_at = started_at
+    
+    # Listing entries carry the full description, so new jobs and every
+    # job still without one (pending or failed on the queue) take theirs
+    # from the listing, which also takes them off the queue; only jobs
+    # whose entry lacks one are fetched one by one
+    missing = load_missing_descriptions(conn)
+    listed_descriptions = {}
+    
+    try:
+        pages = iter_listing_pages(page_size=LISTING_PAGE_SIZE, workers=LISTING_WORKERS, rate=LISTING_RATE)
+        for page in timer.timed(pages, 'listing_fetch'):
+            jobs_found += len(page)
+            with timer.phase('extraction'):
+                raw_names = extract_many([job.get('title') for job in page])
+            for job, facility_name_raw in zip(page, raw_names):
+                req_id = job.get('req_id')
+                title = job.get('title')
+                url = job.get('url')
+                city = job.get('city', '')
+                state = job.get('state', '')
+                location = f"{city}, {state}".strip(', ')
+                posted_date = job.get('pub_date')
+                if job.get('description') and (req_id not in known or req_id in missing):
+                    listed_descriptions[req_id] = job['description']
         
-        facility_name_raw = extract_facility_name(title)
-        facility_name_standard = None
-        verified = False
+                facility_id = None
+                verified = False
         
-        if facility_name_raw:
-            match, score = find_best_match(facility_name_raw, master_facilities)
-            if match:
-                facility_name_standard = match
-                verified = True
+                if facility_name_raw:
+                    with timer.phase('matching'):
+                        facility_id, score = matcher.match(facility_name_raw, state)
+                    verified = facility_id is not None
         
-        cursor.execute("SELECT job_id FROM jobs WHERE job_id = ?", (req_id,))
-        if not cursor.fetchone():
-            cursor.execute('''
-            INSERT INTO jobs (job_id, title, url, location, posted_date, facility_name_raw, facility_name_standard, verified_facility)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (req_id, title, url, location, posted_date, facility_name_raw, facility_name_standard, verified))
-            new_jobs += 1
-            new_job_ids.append(req_id)
-            
-            if verified:
-                logger.info(f"New job: {title} - {req_id} [VERIFIED: {facility_name_standard}]")
-            elif facility_name_raw:
-                logger.info(f"New job: {title} - {req_id} [UNVERIFIED: {facility_name_raw}]")
-            else:
-                logger.info(f"New job: {title} - {req_id} [No facility found]")
+                listed_rows.append((req_id, title, url, location, posted_date, facility_name_raw, facility_id, verified))
+                if req_id not in known:
+                    if verified:
+                        logger.info(f"New job: {title} - {req_id} [VERIFIED: {matcher.names[facility_id]}]")
+                    elif facility_name_raw:
+                        logger.info(f"New job: {title} - {req_id} [UNVERIFIED: {facility_name_raw}]")
+                    else:
+                        logger.info(f"New job: {title} - {req_id} [No facility found]")
+    except APIError as e:
+        logger.error(str(e))
+        conn.rollback()
+        # Jobs queued by earlier runs can still be fetched one by one,
+        # unless the listing failed because the API is throttling us
+        if e.status_code in THROTTLE_STATUSES:
+            logger.warning("API is throttling; leaving the description queue for the next run")
+        else:
+            drain_description_queue()
+        with conn:
+            record_run(conn, dict(timer.columns(), scraper='api_scraper', started_at=started_at,
+                                  finished_at=now(), status=f'api_error_{e.status_code}', jobs_found=jobs_found,
+                                  descriptions_updated=updated_jobs, descriptions_failed=failed_jobs))
+        conn.close()
+        return
     
-    conn.commit()
+    logger.info(f"Total jobs found: {jobs_found}")
+    harvested = [(job_id, clean_html(description)) for job_id, description in listed_descriptions.items()]
+    with timer.phase('db_write'), conn:
+        matcher.save()
+        new_job_ids, changed_job_ids, closed_jobs = sync_jobs(conn, listed_rows, seen_at, known=known)
+        update_descriptions(conn, harvested, cleaned_version=CLEANER_VERSION, updated_at=started_at)
+        queue_descriptions(conn, [job_id for job_id in new_job_ids if job_id not in listed_descriptions])
+    updated_jobs += len(harvested)
+    new_jobs = len(new_job_ids)
     logger.info(f"Added {new_jobs} new jobs")
+    if closed_jobs is None:
+        logger.warning(f"Listing has only {jobs_found} jobs, far fewer than are open; not closing any jobs")
+    logger.info(f"Changed jobs: {len(changed_job_ids)}, closed jobs: {closed_jobs}")
+    logger.info(f"Facility match cache: {matcher.hits} hits, {matcher.misses} misses")
     
-    # Get descriptions only for new jobs
-    if new_job_ids:
-        logger.info(f"Fetching descriptions for {len(new_job_ids)} new jobs...")
-    else:
-        logger.info("No new jobs, skipping description fetch")
-    
-    for job_id in new_job_ids:
-        try:
-            desc_url = f"https://careers.aramark.com/wp-json/aramark/jobs?limit=1&req_id={job_id}"
-            response = requests.get(desc_url)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data and len(data) > 0:
-                    description = data[0].get('description', '')
-                    description = clean_html(description)
-                    cursor.execute("UPDATE jobs SET description = ? WHERE job_id = ?", (description, job_id))
-                    updated_jobs += 1
-                    logger.info(f"Updated description for {job_id}")
-            
-            time.sleep(0.5)  # Be nice to the API
-            
-        except Exception as e:
-            logger.error(f"Error getting description for {job_id}: {e}")
-    
-    conn.commit()
+    # Get descriptions only for new jobs, and any left over from an
+    # interrupted run, that the listing did not include
+    logger.info(f"Took {len(harvested)} descriptions from the listing")
+    drain_description_queue()
+    pending = conn.execute("SELECT COUNT(*) FROM description_queue WHERE state = 'pending'").fetchone()[0]
     
     # Summary
     cursor.execute("SELECT COUNT(*) FROM jobs")
     total = cursor.fetchone()[0]
     
-    cursor.execute("SELECT COUNT(DISTINCT facility_name_standard) FROM jobs WHERE verified_facility = 1")
+    cursor.execute("SELECT COUNT(DISTINCT facility_id) FROM jobs WHERE verified_facility = 1")
     verified_facilities = cursor.fetchone()[0]
     
     cursor.execute("SELECT COUNT(DISTINCT facility_name_raw) FROM jobs WHERE verified_facility = 0 AND facility_name_raw IS NOT NULL")
@@ -201,31 +198,51 @@ def scrape_all_jobs():
     logger.info(f"\n=== SUMMARY ===")
     logger.info(f"Total jobs in database: {total}")
     logger.info(f"New jobs added: {new_jobs}")
+    logger.info(f"Jobs changed: {len(changed_job_ids)}")
+    logger.info(f"Jobs closed: {closed_jobs}")
     logger.info(f"Descriptions updated: {updated_jobs}")
+    logger.info(f"Descriptions failed: {failed_jobs}, still pending: {pending}")
     logger.info(f"Verified facilities: {verified_facilities}")
     logger.info(f"Unverified facilities: {unverified_facilities}")
-    logger.info(f"Log saved to: {log_file}")
-    
-    conn.close()
     
     # Export all jobs to CSV
-    export_to_csv()
-
-def export_to_csv():
-    import csv
-    conn = sqlite3.connect('jobs.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM jobs")
-    jobs = cursor.fetchall()
-    column_names = [description[0] for description in cursor.description]
-    
-    with open('jobs.csv', 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(column_names)
-        writer.writerows(jobs)
+    with timer.phase('export'):
+        exported = export_jobs(conn, 'jobs.csv')
+    if exported is None:
+        logger.info("No changes since last export, jobs.csv left as is")
+    else:
+        logger.info(f"Exported {exported} jobs to jobs.csv")
+    
+    run = dict(
+        timer.columns(),
+        scraper='api_scraper',
+        started_at=started_at,
+        finished_at=now(),
+        status='ok',
+        jobs_found=jobs_found,
+        new_jobs=new_jobs,
+        changed_jobs=len(changed_job_ids),
+        closed_jobs=closed_jobs,
+        descriptions_updated=updated_jobs,
+        descriptions_failed=failed_jobs,
+        descriptions_pending=pending,
+        total_jobs=total,
+        verified_facilities=verified_facilities,
+        unverified_facilities=unverified_facilities,
+        match_cache_hits=matcher.hits,
+        match_cache_misses=matcher.misses,
+    )
+    with conn:
+        run_id = record_run(conn, run)
+    logger.info(f"Run {run_id} finished in {run['total_s']:.1f}s", extra={'data': dict(run, run_id=run_id)})
+    logger.info(f"Log saved to: {log_file}")
     
-    logger.info(f"Exported {len(jobs)} jobs to jobs.csv")
     conn.close()
 
 if __name__ == "__main__":
-    scrape_all_jobs()
+    parser = argparse.ArgumentParser(description="Scrape correctional facility jobs from the Aramark API")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    module = sys.modules[__name__]
+    counted = [(FacilityExtractor, 'extract'), (module, 'clean_html'), (CachedMatcher, 'match'), (FacilityMatcher, 'match')]
+    run_with_profiling(scrape_all_jobs, 'api_scraper', args, counted=counted)
@@ -0,0 +1,226 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from http_client import get_session
+
+JOBS_API_URL = "https://careers.aramark.com/wp-json/aramark/jobs"
+
+# Statuses the API uses to tell us to slow down
+THROTTLE_STATUSES = (403, 429)
+
+LISTING_PARAMS = {
+    'path': '',
+    'zips': '',
+    'industries': 'correctional facilities',
+    'categories': '',
+    'jobfunction': '',
+    'sub_categories': '',
+    'types': '',
+    'keyword': '',
+}
+
+# Fields of a listing job the scrapers use. The listing returns full job
+# objects, description included; everything else is dropped on arrival.
+LISTING_FIELDS = ('req_id', 'title', 'url', 'city', 'state', 'pub_date', 'description')
+
+# Descriptions rarely change once posted, so a cached copy is reused for a
+# day; listing pages always go back to the server (conditionally)
+DESCRIPTION_TTL = 24 * 60 * 60
+
+# Used for a single unpaged request if the API stops honoring offset
+UNPAGED_LIMIT = 10000
+
+
+class APIError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"API request failed with status {status_code}")
+        self.status_code = status_code
+
+
+class CircuitOpen(Exception):
+    """A request not sent because the API kept throttling earlier ones."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every request of a run.
+
+    pause() holds back all callers, so a Retry-After seen by one worker
+    throttles the whole pool rather than just that worker.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+def retry_after_seconds(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def get_with_backoff(url, limiter, params=None, retries=4, backoff=2.0, timeout=30, ttl=None):
+    session = get_session()
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        response = session.get(url, params=params, timeout=timeout, ttl=ttl)
+        if response.status_code not in THROTTLE_STATUSES or attempt == retries:
+            return response
+        delay = retry_after_seconds(response)
+        if delay is None:
+            delay = backoff * 2 ** attempt
+        limiter.pause(delay)
+    return response
+
+
+def fetch_json(limiter, params, ttl=None):
+    response = get_with_backoff(JOBS_API_URL, limiter, params=params, ttl=ttl)
+    if response.status_code != 200:
+        raise APIError(response.status_code)
+    return response.json()
+
+
+def project(job, fields):
+    return {field: job[field] for field in fields if field in job}
+
+
+def fetch_listing_page(limiter, offset, limit, fields=None):
+    jobs = fetch_json(limiter, dict(LISTING_PARAMS, limit=limit, offset=offset)) or []
+    if fields:
+        jobs = [project(job, fields) for job in jobs]
+    return jobs
+
+
+def iter_listing_pages(page_size=100, workers=4, rate=4.0, fields=LISTING_FIELDS):
+    """Walk the correctional-facilities listing page by page.
+
+    Up to `workers` pages are in flight at once and each page's jobs are
+    yielded as soon as it arrives, so callers can process while the rest
+    downloads. Jobs are cut down to `fields` (all fields if None) in the
+    worker that fetched them, and jobs already yielded by another page are
+    dropped. Raises APIError if any page fails.
+    """
+    limiter = TokenBucket(rate)
+    seen = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        next_offset = 0
+        exhausted = False
+        offset_ignored = False
+
+        def submit_next():
+            nonlocal next_offset
+            future = executor.submit(fetch_listing_page, limiter, next_offset, page_size, fields)
+            pending[future] = next_offset
+            next_offset += page_size
+
+        for _ in range(workers):
+            submit_next()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                offset = pending.pop(future)
+                jobs = future.result()
+                new = [job for job in jobs if job.get('req_id') not in seen]
+                seen.update(job.get('req_id') for job in new)
+
+                if len(jobs) < page_size:
+                    exhausted = True
+                elif offset > 0 and not new:
+                    # A full page of repeats means offset is being ignored
+                    exhausted = offset_ignored = True
+
+                if new:
+                    yield new
+                if not exhausted:
+                    submit_next()
+
+    if offset_ignored:
+        jobs = fetch_listing_page(limiter, 0, UNPAGED_LIMIT, fields)
+        new = [job for job in jobs if job.get('req_id') not in seen]
+        if new:
+            yield new
+
+
+def fetch_description(job_id, limiter):
+    data = fetch_json(limiter, {'limit': 1, 'req_id': job_id}, ttl=DESCRIPTION_TTL)
+    if data and len(data) > 0:
+        return data[0].get('description', '')
+    return None
+
+
+def fetch_descriptions(job_ids, workers=8, rate=8.0):
+    """Fetch descriptions concurrently, yielding (job_id, description, error)
+    in completion order. The caller does all database writes.
+
+    A throttle status that outlasts get_with_backoff's retries trips a
+    circuit breaker: requests not yet sent are dropped and their jobs never
+    yielded, so the caller leaves them queued for a later run.
+    """
+    limiter = TokenBucket(rate)
+    tripped = threading.Event()
+
+    def fetch(job_id):
+        if tripped.is_set():
+            raise CircuitOpen()
+        try:
+            return fetch_description(job_id, limiter)
+        except APIError as e:
+            if e.status_code in THROTTLE_STATUSES:
+                tripped.set()
+            raise
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(fetch, job_id): job_id for job_id in job_ids}
+        cancelled = False
+        for future in as_completed(futures):
+            job_id = futures[future]
+            if future.cancelled():
+                continue
+            try:
+                yield job_id, future.result(), None
+            except CircuitOpen:
+                continue
+            except Exception as e:
+                yield job_id, None, e
+            if tripped.is_set() and not cancelled:
+                for pending in futures:
+                    pending.cancel()
+                cancelled = True
@@ -0,0 +1,331 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from database import setup_database, sync_jobs, update_descriptions
+from exporter import export_jobs
+from facility_extractor import FacilityExtractor
+from facility_catalog import PRISONS_PATH, parse_prisons
+from facility_matcher import STATE_NAMES, FacilityMatcher, StateMatcher, facility_tokens
+from html_cleaner import clean_html
+from search import search_jobs
+
+BENCHMARKS = ('extraction', 'matching', 'state_matching', 'clean_html', 'ingest', 'export', 'search')
+
+# Queries timed by the search benchmark
+SEARCH_QUERIES = ('food service director', 'commissary', 'supervis*', 'county jail cook', 'background check')
+DEFAULT_JOBS = (500,)
+DEFAULT_FACILITIES = (853,)
+DEFAULT_SEED = 1
+
+PLACES = (
+    'Adams', 'Arapahoe', 'Bayside', 'Benton', 'Boone', 'Bristol', 'Brookfield', 'Carroll', 'Cecil',
+    'Cedar', 'Clark', 'Clay', 'Clinton', 'Crawford', 'Cumberland', 'Dallas', 'Douglas', 'Eastern',
+    'Elk River', 'Fairfield', 'Fayette', 'Franklin', 'Fulton', 'Grant', 'Greene', 'Hamilton',
+    'Hancock', 'Harrison', 'Henry', 'Highland', 'Jackson', 'Jefferson', 'Johnson', 'Knox',
+    'Lake', 'Lawrence', 'Lee', 'Lincoln', 'Logan', 'Lucas', 'Madison', 'Marion', 'Marshall',
+    'Mercer', 'Monroe', 'Montgomery', 'Morgan', 'Nueces', 'Ogden', 'Oak Ridge', 'Perry', 'Pike',
+    'Polk', 'Putnam', 'Randolph', 'Red Rock', 'Richland', 'Scott', 'Shawnee', 'Shelby', 'Stone Mountain',
+    'Sullivan', 'Summit', 'Taylor', 'Union', 'Valley', 'Warren', 'Washington', 'Wayne', 'Western',
+    'Williams', 'Wood', 'York',
+)
+
+FACILITY_TYPES = (
+    'County Jail', 'County Detention Center', 'Correctional Facility', 'Correctional Institution',
+    'Correctional Center', 'State Prison', 'Work Release Center', 'Detention Center',
+    "Women's Correctional Facility", 'Justice Complex', 'Penitentiary', 'Regional Jail',
+)
+
+ROLES = (
+    'Food Service Worker', 'Food Service Worker I', 'Food Service Supervisor', 'Food Service Manager',
+    'Food Service Director', 'Commissary Worker', 'Commissary Manager', 'Corrections Oversight Worker',
+    'Cook', 'Administrative Assistant',
+)
+
+BOILERPLATE = (
+    "<p><strong>Overview:</strong></p><p>Aramark proudly serves the world&rsquo;s leading educational "
+    "institutions, Fortune 500 companies, world champion sports teams, prominent healthcare providers, "
+    "iconic destinations and cultural attractions, and numerous municipalities in 19 countries.</p>",
+    "<p><strong>Job Responsibilities:</strong></p><ul><li>Prepares and serves food following recipes "
+    "and portion standards</li><li>Supervises inmate workers in the kitchen &amp; dining areas</li>"
+    "<li>Maintains sanitation and safety standards</li><li>Completes production records</li></ul>",
+    "<p><strong>Qualifications:</strong></p><ul><li>Previous food service experience preferred</li>"
+    "<li>Must pass a background check required by the facility</li><li>Able to stand for long periods"
+    "</li></ul>",
+    "<p>Aramark is an equal opportunity employer. All qualified applicants will receive consideration "
+    "for employment without regard to race, color, religion, sex, national origin, age, disability "
+    "or protected veteran status.</p>",
+)
+
+
+def generate_facilities(count, seed=DEFAULT_SEED, base=None):
+    """Master list of count facilities as (state name, facility) pairs.
+
+    Starts from the real master list when given, then adds synthetic
+    "<Place> [<Place>] <Type>" names until count is reached.
+    """
+    rng = random.Random(seed)
+    facilities = list(base or [])[:count]
+    seen = {name for _, name in facilities}
+    states = list(STATE_NAMES.values())
+    while len(facilities) < count:
+        place = rng.choice(PLACES)
+        if len(facilities) >= len(PLACES) * len(FACILITY_TYPES) // 2 or rng.random() < 0.3:
+            place = f"{place} {rng.choice(PLACES)}"
+        name = f"{place} {rng.choice(FACILITY_TYPES)}"
+        if name not in seen:
+            seen.add(name)
+            facilities.append((rng.choice(states), name))
+    return facilities
+
+
+def write_master_list(facilities, path):
+    """Write facilities in the clean_prisons.txt layout: "State:" headers."""
+    by_state = {}
+    for state, name in facilities:
+        by_state.setdefault(state, []).append(name)
+    with open(path, 'w', encoding='utf-8') as f:
+        for state, names in by_state.items():
+            f.write(f"\n{state or 'Other'}:\n")
+            for name in names:
+                f.write(f"{name}\n")
+
+
+def perturb(name, rng):
+    """A facility name as it tends to appear in job titles."""
+    roll = rng.random()
+    if roll < 0.15:
+        return name.replace('Detention Center', 'DC')
+    if roll < 0.3:
+        words = name.split()
+        if len(words) > 3:
+            del words[rng.randrange(1, len(words) - 1)]
+        return ' '.join(words)
+    if roll < 0.4:
+        i = rng.randrange(len(name))
+        return name[:i] + name[i + 1:]
+    if roll < 0.5:
+        return name + ' (New)'
+    return name
+
+
+def generate_jobs(count, facilities, seed=DEFAULT_SEED, unmatched=0.15):
+    """Synthetic listing payloads shaped like the Aramark jobs API.
+
+    Titles cover the shapes extract_facility_name handles: "Role - Facility",
+    "Role - Facility - ST - (code)", "Role - Facility - (code)", bare
+    "Role" and "Role at X County Jail". About `unmatched` of the jobs
+    name a facility that is not on the master list.
+    """
+    rng = random.Random(seed + 1)
+    codes = {name: abbreviation for abbreviation, name in STATE_NAMES.items()}
+    start = datetime(2025, 10, 1)
+    jobs = []
+    for i in range(count):
+        state_name, facility = rng.choice(facilities)
+        if rng.random() < unmatched:
+            facility = f"{rng.choice(PLACES)} {rng.choice(('County Commissary', 'County Sheriff Office', 'County Maryland'))}"
+        state = codes.get(state_name, rng.choice(list(STATE_NAMES)))
+        role = rng.choice(ROLES)
+        shown = perturb(facility, rng)
+        shape = rng.random()
+        if shape < 0.55:
+            title = f"{role} - {shown}"
+        elif shape < 0.75:
+            title = f"{role} - {shown} - {state} - ({rng.randint(100, 999)}/{rng.randint(100, 999)})"
+        elif shape < 0.85:
+            title = f"{role} - {shown} - ({rng.randint(1000, 9999)})"
+        elif shape < 0.93:
+            title = role
+        else:
+            title = f"{role} at {rng.choice(PLACES)} County Jail"
+        paragraphs = rng.sample(BOILERPLATE, rng.randint(2, len(BOILERPLATE)))
+        paragraphs.insert(0, f"<p>Join our team at {shown} as a {role}.</p>")
+        req_id = str(600000 + i)
+        jobs.append({
+            'req_id': req_id,
+            'title': title,
+            'url': f"https://careers.aramark.com/job/?req_id={req_id}",
+            'city': rng.choice(PLACES),
+            'state': state,
+            'pub_date': (start + timedelta(days=rng.randrange(60))).strftime('%Y-%m-%d'),
+            'description': ''.join(paragraphs),
+        })
+    return jobs
+
+
+def timed(func, repeat):
+    """Best wall time of repeat calls, and the last result."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_benchmarks(job_count, facility_count, selected=BENCHMARKS, repeat=3, seed=DEFAULT_SEED, base=None):
+    facilities = generate_facilities(facility_count, seed, base)
+    jobs = generate_jobs(job_count, facilities, seed)
+    names = [name for _, name in facilities]
+    titles = [job['title'] for job in jobs]
+    results = []
+
+    def record(benchmark, seconds, items):
+        results.append({
+            'benchmark': benchmark,
+            'jobs': job_count,
+            'facilities': facility_count,
+            'seconds': round(seconds, 6),
+            'items': items,
+            'items_per_second': round(items / seconds, 1) if seconds else None,
+        })
+
+    extracted = FacilityExtractor().extract_many(titles)
+    if 'extraction' in selected:
+        # A fresh extractor each time, so the memo starts empty
+        seconds, _ = timed(lambda: FacilityExtractor().extract_many(titles), repeat)
+        record('extraction', seconds, len(titles))
+
+    if 'matching' in selected:
+        raw_names = [name for name in extracted if name]
+        # A fresh matcher each time, so the index build and every name are cold
+        seconds, _ = timed(lambda: FacilityMatcher(names).match_many(raw_names), repeat)
+        record('matching', seconds, len(raw_names))
+
+    if 'state_matching' in selected:
+        pairs = [(name, job['state']) for name, job in zip(extracted, jobs) if name]
+        raw_names = [name for name, _ in pairs]
+        states = [state for _, state in pairs]
+        seconds, _ = timed(lambda: StateMatcher(facilities).match_many(raw_names, states), repeat)
+        record('state_matching', seconds, len(raw_names))
+
+    descriptions = [job['description'] for job in jobs]
+    if 'clean_html' in selected:
+        seconds, _ = timed(lambda: [clean_html(description) for description in descriptions], repeat)
+        record('clean_html', seconds, len(descriptions))
+
+    if not {'ingest', 'export', 'search'} & set(selected):
+        return results
+
+    # Facilities get their list position as catalog id
+    catalog = [(facility_id, state, name, ' '.join(facility_tokens(name)), '[]', False)
+               for facility_id, (state, name) in enumerate(facilities, 1)]
+    facility_ids = {}
+    for facility_id, _, name, _, _, _ in catalog:
+        facility_ids.setdefault(name, facility_id)
+    matcher = FacilityMatcher(names)
+    rows = []
+    for job, raw in zip(jobs, extracted):
+        facility_id = facility_ids.get(matcher.match(raw)[0]) if raw else None
+        location = f"{job['city']}, {job['state']}"
+        rows.append((job['req_id'], job['title'], job['url'], location, job['pub_date'], raw, facility_id, facility_id is not None))
+    cleaned = [(job['req_id'], clean_html(job['description'])) for job in jobs]
+    seen_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    workdir = tempfile.mkdtemp(prefix='aramark_bench_')
+    try:
+        def ingest():
+            path = os.path.join(workdir, 'jobs.db')
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            conn = setup_database(path)
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO facilities (id, state, name, tokens, aliases, closed) VALUES (?, ?, ?, ?, ?, ?)", catalog)
+                sync_jobs(conn, rows, seen_at)
+                update_descriptions(conn, cleaned)
+            return conn
+
+        seconds, conn = timed(ingest, repeat)
+        if 'ingest' in selected:
+            record('ingest', seconds, len(rows))
+        if 'export' in selected:
+            for name in ('jobs.csv', 'jobs.ndjson.gz'):
+                path = os.path.join(workdir, name)
+                seconds, _ = timed(lambda: export_jobs(conn, path, force=True), repeat)
+                record(f"export_{name.split('.', 1)[1].replace('.', '_')}", seconds, len(rows))
+        if 'search' in selected:
+            seconds, _ = timed(lambda: [search_jobs(conn, query) for query in SEARCH_QUERIES], repeat)
+            record('search', seconds, len(SEARCH_QUERIES))
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def int_list(value):
+    return [int(part) for part in value.split(',') if part]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks on a synthetic job and facility corpus")
+    parser.add_argument('--jobs', type=int_list, default=list(DEFAULT_JOBS),
+                        help="comma-separated job counts, e.g. 500,5000,100000")
+    parser.add_argument('--facilities', type=int_list, default=list(DEFAULT_FACILITIES),
+                        help="comma-separated master list sizes, e.g. 853,5000,50000")
+    parser.add_argument('--only', default=','.join(BENCHMARKS),
+                        help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--repeat', type=int, default=3, help="report the best of this many runs")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--synthetic-only', action='store_true',
+                        help="do not seed the facility list with prisons.txt")
+    parser.add_argument('--output', help="append the results as one JSON line to this file")
+    parser.add_argument('--write-corpus', metavar='DIR',
+                        help="write the corpus for the first sizes to DIR (jobs.json, clean_prisons.txt) and exit")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    base = None
+    if not args.synthetic_only and os.path.exists(PRISONS_PATH):
+        base = [(facility['state'], facility['name']) for facility in parse_prisons()]
+
+    if args.write_corpus:
+        os.makedirs(args.write_corpus, exist_ok=True)
+        facilities = generate_facilities(args.facilities[0], args.seed, base)
+        write_master_list(facilities, os.path.join(args.write_corpus, 'clean_prisons.txt'))
+        with open(os.path.join(args.write_corpus, 'jobs.json'), 'w', encoding='utf-8') as f:
+            json.dump(generate_jobs(args.jobs[0], facilities, args.seed), f, indent=1)
+        print(f"Wrote {args.jobs[0]} jobs and {args.facilities[0]} facilities to {args.write_corpus}/")
+        sys.exit()
+
+    report = {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': [],
+    }
+    for facility_count in args.facilities:
+        for job_count in args.jobs:
+            for result in run_benchmarks(job_count, facility_count, selected, args.repeat, args.seed, base):
+                report['results'].append(result)
+                print(f"{result['benchmark']:<18} jobs={job_count:<7} facilities={facility_count:<6} "
+                      f"{result['seconds']:>10.4f}s  {result['items_per_second'] or 0:>12,.0f}/s", file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(report) + '\n')
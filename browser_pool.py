@@ -0,0 +1,139 @@
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from selenium import webdriver
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from aramark_api import TokenBucket
+
+# Browser waits poll the page every POLL_INTERVAL seconds instead of
+# sleeping a fixed time; PAGE_TIMEOUT bounds how long a slow page may take
+POLL_INTERVAL = float(os.environ.get('BROWSER_POLL_INTERVAL', 0.2))
+PAGE_TIMEOUT = float(os.environ.get('BROWSER_PAGE_TIMEOUT', 10))
+
+# Headless browsers working through description pages, and page loads per
+# second allowed against any one host
+POOL_SIZE = int(os.environ.get('BROWSER_POOL_SIZE', 4))
+POOL_RATE = float(os.environ.get('BROWSER_POOL_RATE', 2))
+
+DESCRIPTION_HEADER = (By.XPATH, "//h2[text()='Job Description']")
+
+
+def new_driver():
+    # Setup Chrome options for GitHub Actions compatibility
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--window-size=1920,1080')
+    options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    return webdriver.Chrome(options=options)
+
+
+def wait(driver, timeout=PAGE_TIMEOUT):
+    return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL)
+
+
+def read_description(driver, url, timeout=PAGE_TIMEOUT):
+    """Rendered text of the Job Description section of a job page."""
+    driver.get(url)
+    desc_header = wait(driver, timeout).until(EC.presence_of_element_located(DESCRIPTION_HEADER))
+    desc_container = desc_header.find_element(By.XPATH, "../following-sibling::div")
+    return desc_container.text.strip()
+
+
+def fetch_descriptions(jobs, size=POOL_SIZE, rate=POOL_RATE, driver_factory=new_driver, timeout=PAGE_TIMEOUT):
+    """Read the descriptions of (job_id, url) pairs with a pool of browsers,
+    yielding (job_id, description, error) in completion order.
+
+    Each of the `size` worker threads drives its own browser, started on
+    its first job, and takes the next job from the pool's shared queue
+    when done. A browser that fails with a WebDriverException other than a
+    missing description (a crash or lost session) is quit and replaced, and
+    the page is tried once more on the new one. Page loads are limited to
+    `rate` per second per host. The caller does all database writes.
+    """
+    limiters = {}
+    drivers = []
+    local = threading.local()
+    lock = threading.Lock()
+
+    def limiter(url):
+        with lock:
+            host = urlparse(url).netloc
+            if host not in limiters:
+                limiters[host] = TokenBucket(rate)
+            return limiters[host]
+
+    def browser():
+        driver = getattr(local, 'driver', None)
+        if driver is None:
+            driver = local.driver = driver_factory()
+            with lock:
+                drivers.append(driver)
+        return driver
+
+    def discard(driver):
+        local.driver = None
+        with lock:
+            drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            # A crashed browser may not even answer quit
+            pass
+
+    def fetch(url):
+        for attempt in range(2):
+            driver = browser()
+            limiter(url).acquire()
+            try:
+                return read_description(driver, url, timeout)
+            except (TimeoutException, NoSuchElementException):
+                raise
+            except WebDriverException:
+                discard(driver)
+                if attempt:
+                    raise
+
+    try:
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            futures = {executor.submit(fetch, url): job_id for job_id, url in jobs}
+            for future in as_completed(futures):
+                job_id = futures[future]
+                try:
+                    yield job_id, future.result(), None
+                except Exception as e:
+                    yield job_id, None, e
+    finally:
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                # One dead browser must not keep the rest running
+                pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read job descriptions from pages with the browser pool, "
+                                                 "e.g. fixture pages served by python -m http.server")
+    parser.add_argument('urls', nargs='+')
+    parser.add_argument('--size', type=int, default=POOL_SIZE, help="browsers in the pool")
+    parser.add_argument('--rate', type=float, default=POOL_RATE, help="page loads per second per host")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    failed = 0
+    for url, description, error in fetch_descriptions([(url, url) for url in args.urls], args.size, args.rate):
+        if error:
+            failed += 1
+            print(f"✗ {url}: {error!r}")
+        else:
+            print(f"✓ {url}: {len(description)} chars, {' '.join(description.split())[:80]}")
+    print(f"\n{len(args.urls)} pages ({failed} failed) in {time.perf_counter() - start:.1f}s "
+          f"with {args.size} browsers at {args.rate}/s per host")
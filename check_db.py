@@ -1,49 +1,215 @@
-import sqlite3
-
-conn = sqlite3.connect('jobs.db')
-cursor = conn.cursor()
-
-# Get total count
-cursor.execute("SELECT COUNT(*) FROM jobs")
-total = cursor.fetchone()[0]
-
-# Get jobs with descriptions
-cursor.execute("SELECT COUNT(*) FROM jobs WHERE description IS NOT NULL AND description != ''")
-with_desc = cursor.fetchone()[0]
-
-# Get verified facilities
-cursor.execute("SELECT COUNT(DISTINCT facility_name_standard) FROM jobs WHERE verified_facility = 1")
-verified_facilities = cursor.fetchone()[0]
-
-# Get unverified facilities
-cursor.execute("SELECT COUNT(DISTINCT facility_name_raw) FROM jobs WHERE verified_facility = 0 AND facility_name_raw IS NOT NULL")
-unverified_facilities = cursor.fetchone()[0]
-
-# Get all jobs with all fields
-cursor.execute("SELECT * FROM jobs")
-all_jobs = cursor.fetchall()
-
-print(f"=== DATABASE SUMMARY ===")
-print(f"Total jobs: {total}")
-print(f"Jobs with descriptions: {with_desc}")
-print(f"Verified facilities: {verified_facilities}")
-print(f"Unverified facilities: {unverified_facilities}")
-
-print(f"\n=== ALL JOBS (ALL FIELDS) ===")
-for job in all_jobs:
-    job_id, title, url, location, posted_date, description, raw, standard, verified = job
-    print(f"\n{'='*80}")
-    print(f"Job ID: {job_id}")
-    print(f"Title: {title}")
-    print(f"URL: {url}")
-    print(f"Location: {location}")
-    print(f"Posted Date: {posted_date}")
-    print(f"Facility (Raw): {raw}")
-    print(f"Facility (Standard): {standard}")
-    print(f"Verified: {'✓' if verified else '✗'}")
-    print(f"Description: {description[:200] if description else 'No description'}...")
-    print(f"{'='*80}")
-
-
-
-conn.close()
+import argparse
+from database import connect
+from facility_matcher import normalize_state, state_from_location
+
+# Jobs shown per page by the jobs report
+PAGE_SIZE = 50
+
+# Every report reads an index (see setup_database) and prints rows as the
+# cursor yields them, so none of them holds the jobs table in memory.
+
+
+def print_summary(conn):
+    cursor = conn.cursor()
+
+    # Get total count
+    cursor.execute("SELECT COUNT(*), COUNT(*) - COUNT(closed_at) FROM jobs")
+    total, open_jobs = cursor.fetchone()
+
+    # Get jobs with descriptions
+    cursor.execute("SELECT COUNT(*) FROM jobs WHERE description_hash IS NOT NULL")
+    with_desc = cursor.fetchone()[0]
+
+    # Get verified facilities
+    cursor.execute("SELECT COUNT(DISTINCT facility_id) FROM jobs WHERE verified_facility = 1")
+    verified_facilities = cursor.fetchone()[0]
+
+    # Get unverified facilities
+    cursor.execute("SELECT COUNT(DISTINCT facility_name_raw) FROM jobs WHERE verified_facility = 0 AND facility_name_raw IS NOT NULL")
+    unverified_facilities = cursor.fetchone()[0]
+
+    cursor.execute("SELECT MIN(posted_date), MAX(posted_date) FROM jobs")
+    first_posted, last_posted = cursor.fetchone()
+
+    print(f"=== DATABASE SUMMARY ===")
+    print(f"Total jobs: {total} ({open_jobs} open)")
+    print(f"Jobs with descriptions: {with_desc}")
+    print(f"Verified facilities: {verified_facilities}")
+    print(f"Unverified facilities: {unverified_facilities}")
+    print(f"Posted: {first_posted} to {last_posted}")
+
+
+def print_facilities(conn, verified=True):
+    """Jobs per facility, most first: catalog facilities for verified jobs,
+    raw extracted names for unverified ones."""
+    if verified:
+        cursor = conn.execute('''
+        SELECT f.name, f.state, c.jobs, c.open_jobs
+        FROM (SELECT facility_id, COUNT(*) AS jobs, COUNT(*) - COUNT(closed_at) AS open_jobs
+              FROM jobs WHERE verified_facility = 1 GROUP BY facility_id) c
+        LEFT JOIN facilities f ON f.id = c.facility_id
+        ORDER BY c.jobs DESC, f.name
+        ''')
+    else:
+        cursor = conn.execute('''
+        SELECT facility_name_raw, NULL, COUNT(*) AS jobs, COUNT(*) - COUNT(closed_at)
+        FROM jobs WHERE verified_facility = 0 AND facility_name_raw IS NOT NULL
+        GROUP BY facility_name_raw
+        ORDER BY jobs DESC, facility_name_raw
+        ''')
+    print(f"=== {'VERIFIED' if verified else 'UNVERIFIED'} FACILITIES ===")
+    print(f"{'jobs':>6} {'open':>6}  facility")
+    for name, state, jobs, open_jobs in cursor:
+        print(f"{jobs:>6} {open_jobs:>6}  {name}{f' ({state})' if state else ''}")
+
+
+def print_states(conn):
+    """Jobs per state. Locations are grouped on the location index and
+    folded into their state here; there are only a few hundred of them."""
+    states = {}
+    for location, jobs, verified, open_jobs in conn.execute('''
+    SELECT location, COUNT(*), SUM(verified_facility = 1), COUNT(*) - COUNT(closed_at)
+    FROM jobs GROUP BY location
+    '''):
+        counts = states.setdefault(state_from_location(location) or 'Unknown', [0, 0, 0])
+        counts[0] += jobs
+        counts[1] += verified
+        counts[2] += open_jobs
+    print("=== JOBS BY STATE ===")
+    print(f"{'jobs':>6} {'verified':>8} {'open':>6}  state")
+    for state, (jobs, verified, open_jobs) in sorted(states.items(), key=lambda item: (-item[1][0], item[0])):
+        print(f"{jobs:>6} {verified:>8} {open_jobs:>6}  {state}")
+
+
+def print_weeks(conn, since=None, until=None):
+    """Jobs posted per week (weeks start on Monday), oldest first."""
+    conditions = ["posted_date IS NOT NULL"]
+    params = []
+    if since:
+        conditions.append("posted_date >= ?")
+        params.append(since)
+    if until:
+        conditions.append("posted_date <= ?")
+        params.append(until)
+    cursor = conn.execute(f'''
+    SELECT date(posted_date, '-6 days', 'weekday 1') AS week, COUNT(*), SUM(verified_facility = 1)
+    FROM jobs
+    WHERE {' AND '.join(conditions)}
+    GROUP BY week ORDER BY week
+    ''', params)
+    print("=== JOBS POSTED PER WEEK ===")
+    print(f"{'week of':<10} {'jobs':>6} {'verified':>8}")
+    for week, jobs, verified in cursor:
+        print(f"{week:<10} {jobs:>6} {verified:>8}")
+
+
+def state_locations(conn, state):
+    """Distinct locations in a state, read from the location index."""
+    name = normalize_state(state)
+    if name is None:
+        raise ValueError(f"Unknown state: {state}")
+    return [location for location, in conn.execute("SELECT DISTINCT location FROM jobs")
+            if state_from_location(location) == name]
+
+
+def print_jobs(conn, page_size=PAGE_SIZE, after=None, verified=None, state=None, full=False, all_pages=False):
+    """Jobs newest first, one page at a time.
+
+    Pages seek on the (posted_date, job_id) index from the last row of the
+    previous page, so every page costs the same however deep it is. The
+    cursor for the next page is printed at the end.
+    """
+    conditions = ["posted_date IS NOT NULL"]
+    params = []
+    if verified is not None:
+        conditions.append("verified_facility = ?")
+        params.append(1 if verified else 0)
+    if state:
+        locations = state_locations(conn, state)
+        conditions.append(f"location IN ({', '.join('?' * len(locations))})")
+        params.extend(locations)
+
+    shown = 0
+    while True:
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if after:
+            posted_date, job_id = after.split('|', 1)
+            page_conditions.append("(posted_date, job_id) < (?, ?)")
+            page_params.extend((posted_date, job_id))
+        cursor = conn.execute(f'''
+        SELECT job_id, title, url, location, posted_date, description, facility_name_raw, facility_name_standard,
+               verified_facility, first_seen, last_seen, closed_at
+        FROM job_details
+        WHERE {' AND '.join(page_conditions)}
+        ORDER BY posted_date DESC, job_id DESC
+        LIMIT ?
+        ''', page_params + [page_size])
+
+        count = 0
+        for job in cursor:
+            job_id, title, url, location, posted_date, description, raw, standard, verified_facility, first_seen, last_seen, closed_at = job
+            count += 1
+            after = f"{posted_date}|{job_id}"
+            if not full:
+                facility = f"✓ {standard}" if verified_facility else f"? {raw}" if raw else "-"
+                status = f" [closed {closed_at}]" if closed_at else ""
+                print(f"{posted_date}  {job_id:<10} {title} | {location} | {facility}{status}")
+                continue
+            print(f"\n{'='*80}")
+            print(f"Job ID: {job_id}")
+            print(f"Title: {title}")
+            print(f"URL: {url}")
+            print(f"Location: {location}")
+            print(f"Posted Date: {posted_date}")
+            print(f"Facility (Raw): {raw}")
+            print(f"Facility (Standard): {standard}")
+            print(f"Verified: {'✓' if verified_facility else '✗'}")
+            print(f"First Seen: {first_seen}")
+            print(f"Last Seen: {last_seen}")
+            print(f"Closed: {closed_at if closed_at else 'Open'}")
+            print(f"Description: {description[:200] if description else 'No description'}...")
+            print(f"{'='*80}")
+        shown += count
+
+        if count < page_size:
+            print(f"\n{shown} jobs, end of results")
+            return
+        if not all_pages:
+            print(f"\n{shown} jobs. Next page: --after '{after}'")
+            return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report on jobs.db")
+    parser.add_argument('report', nargs='?', default='summary',
+                        choices=('summary', 'jobs', 'facilities', 'states', 'weeks'))
+    verified = parser.add_mutually_exclusive_group()
+    verified.add_argument('--verified', dest='verified', action='store_const', const=True, help="only verified facilities")
+    verified.add_argument('--unverified', dest='verified', action='store_const', const=False,
+                          help="only unverified facilities (facilities: list raw names)")
+    parser.add_argument('--state', help="jobs: only this state (code or name)")
+    parser.add_argument('--since', help="weeks: posted on or after YYYY-MM-DD")
+    parser.add_argument('--until', help="weeks: posted on or before YYYY-MM-DD")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--after', help="jobs: continue after this cursor (printed at the end of each page)")
+    parser.add_argument('--all', action='store_true', help="jobs: keep going until the last page")
+    parser.add_argument('--full', action='store_true', help="jobs: print every field, including the description")
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        if args.report == 'summary':
+            print_summary(conn)
+        elif args.report == 'facilities':
+            print_facilities(conn, verified=args.verified is not False)
+        elif args.report == 'states':
+            print_states(conn)
+        elif args.report == 'weeks':
+            print_weeks(conn, args.since, args.until)
+        else:
+            print_jobs(conn, args.page_size, args.after, args.verified, args.state, args.full, args.all)
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        conn.close()
@@ -1,27 +1,57 @@
-import sqlite3
-import re
-import html
+import argparse
+from database import decode_description, index_jobs, prune_descriptions, setup_database, store_descriptions
+from html_cleaner import CLEANER_VERSION, clean_html
 
-def clean_html(text):
-    if not text:
-        return text
-    text = html.unescape(text)
-    text = re.sub(r'<[^>]+>', '', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+# Descriptions processed per transaction
+CHUNK_SIZE = 500
 
-conn = sqlite3.connect('jobs.db')
-cursor = conn.cursor()
+parser = argparse.ArgumentParser(description="Clean descriptions not yet processed by the HTML cleaner")
+parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+args = parser.parse_args()
 
-cursor.execute("SELECT job_id, description FROM jobs WHERE description IS NOT NULL")
-jobs = cursor.fetchall()
+conn = setup_database()
 
+# Descriptions are stored once per distinct text, so each is cleaned once
+# and every job sharing it is repointed together. Only rows never cleaned
+# (no cleaned_version) are read, a chunk at a time in hash order: cleaned
+# text has no markup left to clean again.
 cleaned = 0
-for job_id, description in jobs:
-    clean_desc = clean_html(description)
-    cursor.execute("UPDATE jobs SET description = ? WHERE job_id = ?", (clean_desc, job_id))
-    cleaned += 1
+unchanged = 0
+last_hash = ''
+while True:
+    rows = conn.execute('''
+    SELECT hash, body FROM descriptions
+    WHERE cleaned_version IS NULL AND hash > ?
+    ORDER BY hash LIMIT ?
+    ''', (last_hash, args.chunk_size)).fetchall()
+    if not rows:
+        break
+    last_hash = rows[-1][0]
 
-conn.commit()
-print(f"Cleaned {cleaned} job descriptions")
+    repoints = []
+    marks = []
+    for old_hash, body in rows:
+        description = decode_description(body)
+        clean_desc = clean_html(description)
+        if clean_desc == description:
+            marks.append((CLEANER_VERSION, old_hash))
+        else:
+            repoints.append((old_hash, clean_desc))
+
+    with conn:
+        new_hashes = store_descriptions(conn, [text for _, text in repoints], cleaned_version=CLEANER_VERSION)
+        job_ids = [job_id for old_hash, _ in repoints
+                   for job_id, in conn.execute("SELECT job_id FROM jobs WHERE description_hash = ?", (old_hash,))]
+        conn.executemany("UPDATE jobs SET description_hash = ?, updated_at = datetime('now', 'localtime') "
+                         "WHERE description_hash = ?",
+                         [(new_hash, old_hash) for (old_hash, _), new_hash in zip(repoints, new_hashes)])
+        index_jobs(conn, job_ids)
+        conn.executemany("UPDATE descriptions SET cleaned_version = ? WHERE hash = ?", marks)
+    cleaned += len(repoints)
+    unchanged += len(marks)
+
+with conn:
+    pruned = prune_descriptions(conn)
+
+print(f"Cleaned {cleaned} job descriptions ({unchanged} already clean, {pruned} old copies removed)")
 conn.close()
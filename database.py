@@ -0,0 +1,513 @@
+import hashlib
+import sqlite3
+import zlib
+
+DB_PATH = 'jobs.db'
+
+# WAL lets readers such as check_db.py run while a scrape is writing;
+# NORMAL sync is durable across application crashes in WAL mode
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA busy_timeout = 5000',
+)
+
+JOB_COLUMNS = ('job_id', 'title', 'url', 'location', 'posted_date',
+               'facility_name_raw', 'facility_id', 'verified_facility')
+
+# Listing fields whose change counts as a change to the posting
+HASHED_COLUMNS = ('title', 'url', 'location', 'posted_date')
+
+# Columns added to jobs after the original schema, created on startup
+JOB_MIGRATIONS = {
+    'content_hash': 'TEXT',
+    'first_seen': 'TIMESTAMP',
+    'last_seen': 'TIMESTAMP',
+    'closed_at': 'TIMESTAMP',
+    'updated_at': 'TIMESTAMP',
+    'description_hash': 'TEXT',
+    'facility_id': 'INTEGER REFERENCES facilities(id)',
+}
+
+# Columns of the runs table, one row per scraper run
+RUN_COLUMNS = {
+    'scraper': 'TEXT',
+    'started_at': 'TIMESTAMP',
+    'finished_at': 'TIMESTAMP',
+    'status': 'TEXT',
+    'jobs_found': 'INTEGER',
+    'new_jobs': 'INTEGER',
+    'changed_jobs': 'INTEGER',
+    'closed_jobs': 'INTEGER',
+    'descriptions_updated': 'INTEGER',
+    'descriptions_failed': 'INTEGER',
+    'descriptions_pending': 'INTEGER',
+    'total_jobs': 'INTEGER',
+    'verified_facilities': 'INTEGER',
+    'unverified_facilities': 'INTEGER',
+    'match_cache_hits': 'INTEGER',
+    'match_cache_misses': 'INTEGER',
+    'listing_fetch_s': 'REAL',
+    'extraction_s': 'REAL',
+    'matching_s': 'REAL',
+    'db_write_s': 'REAL',
+    'description_fetch_s': 'REAL',
+    'export_s': 'REAL',
+    'total_s': 'REAL',
+}
+
+# A listing with fewer jobs than this fraction of the open jobs is taken
+# to be a bad response (the API answering 200 with an empty or truncated
+# list) rather than mass closures, and closes nothing
+MIN_LISTING_FRACTION = 0.5
+
+# Columns of the jobs_fts full-text index, see create_search_index
+SEARCH_COLUMNS = ('title', 'facility', 'description')
+
+# Descriptions live once per distinct text in the descriptions table
+DESCRIPTION_COMPRESSION_LEVEL = 9
+
+# cleaned_version is the html_cleaner.CLEANER_VERSION that produced the
+# text, or NULL for text that has not been through it
+DESCRIPTION_MIGRATIONS = {
+    'cleaned_version': 'INTEGER',
+}
+
+# Description fetches still to do, see queue_descriptions. A job whose
+# fetch failed this many times is marked failed and no longer retried.
+MAX_DESCRIPTION_ATTEMPTS = 5
+
+
+def connect(path=DB_PATH):
+    conn = sqlite3.connect(path)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    # Lets SQL (and the job_details view) read compressed descriptions
+    conn.create_function('inflate', 1, decode_description, deterministic=True)
+    return conn
+
+
+def setup_database(path=DB_PATH):
+    conn = connect(path)
+    cursor = conn.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        title TEXT,
+        url TEXT,
+        location TEXT,
+        posted_date DATE,
+        description TEXT,
+        facility_name_raw TEXT,
+        verified_facility BOOLEAN
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS facilities (
+        id INTEGER PRIMARY KEY,
+        state TEXT,
+        name TEXT,
+        tokens TEXT,
+        aliases TEXT,
+        closed BOOLEAN,
+        UNIQUE (state, name)
+    )
+    ''')
+    cursor.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    added = add_missing_columns(conn, 'jobs', JOB_MIGRATIONS)
+    if 'updated_at' in added:
+        cursor.execute("UPDATE jobs SET updated_at = COALESCE(last_seen, first_seen)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs (updated_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_description_hash ON jobs (description_hash)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_facility_id ON jobs (facility_id)")
+    # Reporting (check_db.py): facility and state summaries read these
+    # indexes instead of the table, and job pages seek on posted_date
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_verified_facility ON jobs (verified_facility, facility_id, closed_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_verified_raw ON jobs (verified_facility, facility_name_raw, closed_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_posted_date ON jobs (posted_date, job_id, verified_facility)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_location ON jobs (location, verified_facility, closed_at)")
+    # facility_matches is only a cache, so a copy from before matches were
+    # keyed by state and stored as facility ids is dropped rather than migrated
+    if 'facility_id' not in table_columns(conn, 'facility_matches'):
+        cursor.execute("DROP TABLE IF EXISTS facility_matches")
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS facility_matches (
+        facility_name_raw TEXT,
+        state TEXT,
+        facility_id INTEGER,
+        score REAL,
+        master_hash TEXT,
+        PRIMARY KEY (facility_name_raw, state)
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS exports (
+        path TEXT PRIMARY KEY,
+        fingerprint TEXT,
+        exported_at TIMESTAMP,
+        row_count INTEGER
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS descriptions (
+        hash TEXT PRIMARY KEY,
+        body BLOB
+    ) WITHOUT ROWID
+    ''')
+    add_missing_columns(conn, 'descriptions', DESCRIPTION_MIGRATIONS)
+    queue_exists = bool(table_columns(conn, 'description_queue'))
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS description_queue (
+        job_id TEXT PRIMARY KEY,
+        state TEXT DEFAULT 'pending',  -- pending or failed
+        attempts INTEGER DEFAULT 0,
+        last_error TEXT,
+        updated_at TIMESTAMP
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_description_queue_state ON description_queue (state, attempts)")
+    if not queue_exists:
+        # Jobs inserted before the queue existed may never have had their
+        # description fetched
+        queue_missing_descriptions(conn)
+    cursor.execute("CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT)")
+    add_missing_columns(conn, 'runs', RUN_COLUMNS)
+    create_job_details_view(conn)
+    create_search_index(conn)
+    conn.commit()
+    if migrate_descriptions(conn):
+        conn.execute("VACUUM")
+        # VACUUM may renumber jobs rowids, which the search index is keyed on
+        with conn:
+            rebuild_search_index(conn)
+    return conn
+
+
+def create_job_details_view(conn):
+    """(Re)create job_details: jobs with description decoded in place and
+    the catalog name of their facility as facility_name_standard.
+
+    Built from the live column list so columns added by migrations show up
+    in the same order as in jobs.
+    """
+    names = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+    columns = []
+    for name in names:
+        if name == 'description':
+            columns.append('inflate(d.body) AS description')
+        elif name == 'facility_id' and 'facility_name_standard' not in names:
+            columns.extend(('j.facility_id', 'f.name AS facility_name_standard'))
+        elif name != 'description_hash':
+            columns.append(f'j.{name}')
+    create_view(conn, 'job_details', f'''
+    SELECT {', '.join(columns)}
+    FROM jobs j
+    LEFT JOIN descriptions d ON d.hash = j.description_hash
+    LEFT JOIN facilities f ON f.id = j.facility_id
+    ''')
+
+
+def create_view(conn, name, select):
+    """Create view `name` as `select`, replacing it only if its definition
+    changed, so opening an up-to-date database writes nothing."""
+    sql = f"CREATE VIEW {name} AS {select.strip()}"
+    current = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ?", (name,)).fetchone()
+    if current and current[0] == sql:
+        return
+    conn.execute(f"DROP VIEW IF EXISTS {name}")
+    conn.execute(sql)
+
+
+def search_columns(prefix):
+    """SQL for the indexed text of the jobs row `prefix` (new, old or j)."""
+    return (
+        f"{prefix}.title",
+        f"trim(coalesce({prefix}.facility_name_raw, '') || ' ' || "
+        f"coalesce((SELECT name FROM facilities WHERE id = {prefix}.facility_id), ''))",
+        f"(SELECT inflate(body) FROM descriptions WHERE hash = {prefix}.description_hash)",
+    )
+
+
+def create_search_index(conn):
+    """Create the jobs_fts full-text index over title, facility names and
+    description.
+
+    The index keeps its own copy of the indexed text, so any connection can
+    query it (snippets included) without inflate(). The text is read from
+    jobs_fts_source, which does need inflate(), so the index is written only
+    by the helpers below (see index_jobs). Indexes from older versions (over
+    jobs_fts_source as external content, or kept by triggers) are replaced,
+    and a new index is filled from the database once.
+    """
+    current = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'jobs_fts'").fetchone()
+    if current and 'content' in current[0]:
+        conn.execute("DROP TABLE jobs_fts")
+        current = None
+    for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'jobs_fts_%'").fetchall():
+        conn.execute(f"DROP TRIGGER {name}")
+    create_view(conn, 'jobs_fts_source', f'''
+    SELECT j.rowid AS job_rowid, {', '.join(f'{expr} AS {name}' for expr, name in zip(search_columns('j'), SEARCH_COLUMNS))}
+    FROM jobs j
+    ''')
+    conn.execute(f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+        {', '.join(SEARCH_COLUMNS)},
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    ''')
+    if not current:
+        rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn):
+    """Refill jobs_fts from every job's current text."""
+    conn.execute("DELETE FROM jobs_fts")
+    columns = ', '.join(SEARCH_COLUMNS)
+    conn.execute(f"INSERT INTO jobs_fts (rowid, {columns}) SELECT job_rowid, {columns} FROM jobs_fts_source")
+
+
+def index_jobs(conn, job_ids):
+    """Replace the indexed text of jobs with their current text.
+
+    Helpers that insert jobs or change indexed columns (title,
+    facility_name_raw, facility_id, description_hash) call it after the
+    change.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS search_jobs (job_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM search_jobs")
+    conn.executemany("INSERT OR IGNORE INTO search_jobs VALUES (?)", [(job_id,) for job_id in job_ids])
+    rowids = "SELECT rowid FROM jobs WHERE job_id IN (SELECT job_id FROM search_jobs)"
+    conn.execute(f"DELETE FROM jobs_fts WHERE rowid IN ({rowids})")
+    columns = ', '.join(SEARCH_COLUMNS)
+    conn.execute(f"INSERT INTO jobs_fts (rowid, {columns}) SELECT job_rowid, {columns} FROM jobs_fts_source "
+                 f"WHERE job_rowid IN ({rowids})")
+
+
+def migrate_descriptions(conn):
+    """Move descriptions still stored inline in jobs into descriptions."""
+    rows = conn.execute("SELECT job_id, description FROM jobs WHERE description IS NOT NULL").fetchall()
+    if not rows:
+        return 0
+    with conn:
+        hashes = store_descriptions(conn, [description for _, description in rows])
+        conn.executemany("UPDATE jobs SET description = NULL, description_hash = ? WHERE job_id = ?",
+                         [(content_hash, job_id) for (job_id, _), content_hash in zip(rows, hashes)])
+    return len(rows)
+
+
+def table_columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def add_missing_columns(conn, table, columns):
+    existing = table_columns(conn, table)
+    added = []
+    for name, declaration in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {declaration}")
+            added.append(name)
+    return added
+
+
+def load_job_ids(conn):
+    return {row[0] for row in conn.execute("SELECT job_id FROM jobs")}
+
+
+def load_job_hashes(conn):
+    return dict(conn.execute("SELECT job_id, content_hash FROM jobs"))
+
+
+def load_missing_descriptions(conn):
+    """Ids of jobs with no description, whatever their queue state."""
+    return {row[0] for row in conn.execute("SELECT job_id FROM jobs WHERE description_hash IS NULL AND description IS NULL")}
+
+
+def job_content_hash(row):
+    """Hash of the listing fields of a row in JOB_COLUMNS order."""
+    values = [row[JOB_COLUMNS.index(name)] for name in HASHED_COLUMNS]
+    return hashlib.sha256('\x1f'.join('' if v is None else str(v) for v in values).encode()).hexdigest()[:16]
+
+
+# The write helpers below do not commit; callers wrap a batch of them in
+# `with conn:` so that each batch is a single transaction.
+
+def sync_jobs(conn, rows, seen_at, known=None, close_missing=True, update_known=True):
+    """Reconcile one listing (rows in JOB_COLUMNS order) with the jobs table.
+
+    New jobs are inserted, jobs whose content hash changed are rewritten,
+    and every listed job gets last_seen = seen_at. With close_missing,
+    open jobs absent from the listing are marked closed and listed jobs
+    that were closed are reopened, unless the listing is empty or smaller
+    than MIN_LISTING_FRACTION of the open jobs, in which case closed_count
+    is None. Without update_known, known jobs are never rewritten, only
+    their last_seen set. Unchanged rows are never rewritten; every other
+    change stamps updated_at = seen_at.
+    known (job_id: content hash, loaded if not given) is updated in place,
+    so a job listed again by a later call is not inserted twice.
+    Returns (new_ids, changed_ids, closed_count).
+    """
+    if known is None:
+        known = load_job_hashes(conn)
+    if close_missing:
+        open_jobs, = conn.execute("SELECT COUNT(*) FROM jobs WHERE closed_at IS NULL").fetchone()
+        listed = len({row[0] for row in rows})
+        close_missing = listed and listed >= open_jobs * MIN_LISTING_FRACTION
+
+    inserts = []
+    updates = []
+    for row in rows:
+        content_hash = job_content_hash(row)
+        job_id = row[0]
+        if job_id not in known:
+            inserts.append(row + (content_hash, seen_at, seen_at, seen_at))
+        elif update_known and known[job_id] != content_hash:
+            updates.append(row[1:] + (content_hash, seen_at, job_id))
+        else:
+            continue
+        known[job_id] = content_hash
+
+    changed_ids = [row[-1] for row in updates]
+    conn.executemany(f"""
+    INSERT INTO jobs ({', '.join(JOB_COLUMNS)}, content_hash, first_seen, last_seen, updated_at)
+    VALUES ({', '.join('?' * (len(JOB_COLUMNS) + 4))})
+    ON CONFLICT(job_id) DO NOTHING
+    """, inserts)
+    conn.executemany(f"""
+    UPDATE jobs SET {', '.join(f'{name} = ?' for name in JOB_COLUMNS[1:])}, content_hash = ?, updated_at = ?
+    WHERE job_id = ?
+    """, updates)
+    new_ids = [row[0] for row in inserts]
+    index_jobs(conn, new_ids + changed_ids)
+
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen_jobs (job_id TEXT PRIMARY KEY)")
+    conn.execute("DELETE FROM seen_jobs")
+    conn.executemany("INSERT OR IGNORE INTO seen_jobs VALUES (?)", [(row[0],) for row in rows])
+    conn.execute("UPDATE jobs SET last_seen = ? WHERE job_id IN (SELECT job_id FROM seen_jobs)", (seen_at,))
+
+    closed = None
+    if close_missing:
+        conn.execute(
+            "UPDATE jobs SET closed_at = NULL, updated_at = ? WHERE closed_at IS NOT NULL AND job_id IN (SELECT job_id FROM seen_jobs)",
+            (seen_at,))
+        closed = conn.execute(
+            "UPDATE jobs SET closed_at = ?, updated_at = ? WHERE closed_at IS NULL AND job_id NOT IN (SELECT job_id FROM seen_jobs)",
+            (seen_at, seen_at)).rowcount
+
+    return new_ids, changed_ids, closed
+
+
+def description_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def encode_description(text):
+    return zlib.compress(text.encode(), DESCRIPTION_COMPRESSION_LEVEL)
+
+
+def decode_description(body):
+    if body is None:
+        return None
+    return zlib.decompress(body).decode()
+
+
+def store_descriptions(conn, texts, cleaned_version=None):
+    """Store each distinct text once; returns the hash for every text.
+
+    Empty descriptions are not stored and get None.
+    """
+    hashes = [description_hash(text) if text else None for text in texts]
+    new = {content_hash: text for content_hash, text in zip(hashes, texts) if content_hash}
+    conn.executemany("INSERT OR IGNORE INTO descriptions (hash, body, cleaned_version) VALUES (?, ?, ?)",
+                     [(content_hash, encode_description(text), cleaned_version) for content_hash, text in new.items()])
+    return hashes
+
+
+def load_description(conn, job_id):
+    row = conn.execute('''
+    SELECT d.body FROM jobs j JOIN descriptions d ON d.hash = j.description_hash
+    WHERE j.job_id = ?
+    ''', (job_id,)).fetchone()
+    return decode_description(row[0]) if row else None
+
+
+def prune_descriptions(conn):
+    """Delete descriptions no job refers to any more."""
+    return conn.execute(
+        "DELETE FROM descriptions WHERE hash NOT IN (SELECT description_hash FROM jobs WHERE description_hash IS NOT NULL)"
+    ).rowcount
+
+
+def update_descriptions(conn, descriptions, cleaned_version=None, updated_at=None):
+    """Write (job_id, description) pairs and take them off the description
+    queue in the same transaction. updated_at defaults to now; scrapers
+    pass their run's started_at, like sync_jobs' seen_at."""
+    hashes = store_descriptions(conn, [description for _, description in descriptions], cleaned_version)
+    job_ids = [job_id for job_id, _ in descriptions]
+    conn.executemany(
+        "UPDATE jobs SET description_hash = ?, updated_at = coalesce(?, datetime('now', 'localtime')) WHERE job_id = ?",
+        [(content_hash, updated_at, job_id) for job_id, content_hash in zip(job_ids, hashes)])
+    index_jobs(conn, job_ids)
+    conn.executemany("DELETE FROM description_queue WHERE job_id = ?", [(job_id,) for job_id, _ in descriptions])
+
+
+def queue_descriptions(conn, job_ids):
+    """Add jobs to the persisted queue of description fetches.
+
+    The queue outlives the run, so jobs inserted by a run that is then
+    interrupted still get their description from the next one. Jobs
+    already queued keep their state and attempts.
+    """
+    conn.executemany(
+        "INSERT OR IGNORE INTO description_queue (job_id, updated_at) VALUES (?, datetime('now', 'localtime'))",
+        [(job_id,) for job_id in job_ids])
+
+
+def queue_missing_descriptions(conn):
+    """Queue every job that has no description yet; returns how many were added."""
+    return conn.execute('''
+    INSERT OR IGNORE INTO description_queue (job_id, updated_at)
+    SELECT job_id, datetime('now', 'localtime') FROM jobs WHERE description_hash IS NULL AND description IS NULL
+    ''').rowcount
+
+
+def pending_descriptions(conn):
+    """(job_id, url, location, facility_name_raw) of queued jobs still to
+    fetch, least attempted first."""
+    return conn.execute('''
+    SELECT q.job_id, j.url, j.location, j.facility_name_raw
+    FROM description_queue q JOIN jobs j ON j.job_id = q.job_id
+    WHERE q.state = 'pending'
+    ORDER BY q.attempts, q.job_id
+    ''').fetchall()
+
+
+def record_description_failures(conn, failures, max_attempts=MAX_DESCRIPTION_ATTEMPTS):
+    """Count a failed attempt for (job_id, error) pairs; jobs reaching
+    max_attempts are marked failed."""
+    conn.executemany('''
+    UPDATE description_queue
+    SET attempts = attempts + 1, last_error = ?, updated_at = datetime('now', 'localtime'),
+        state = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END
+    WHERE job_id = ?
+    ''', [(str(error), max_attempts, job_id) for job_id, error in failures])
+
+
+def update_facilities(conn, facilities, updated_at=None):
+    """Write (job_id, facility_name_raw, facility_id, verified) rows,
+    stamped like update_descriptions."""
+    job_ids = [row[0] for row in facilities]
+    conn.executemany(
+        "UPDATE jobs SET facility_name_raw = ?, facility_id = ?, verified_facility = ?, "
+        "updated_at = coalesce(?, datetime('now', 'localtime')) WHERE job_id = ?",
+        [(raw, facility_id, verified, updated_at, job_id) for job_id, raw, facility_id, verified in facilities])
+    index_jobs(conn, job_ids)
+
+
+def record_run(conn, run):
+    """Insert a runs row from a dict of RUN_COLUMNS values; returns run_id."""
+    columns = [name for name in run if name in RUN_COLUMNS]
+    return conn.execute(
+        f"INSERT INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [run[name] for name in columns]).lastrowid
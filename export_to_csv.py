@@ -1,21 +1,28 @@
-import sqlite3
-import csv
+import argparse
+from database import setup_database
+from exporter import FORMATS, export_jobs, run_started_at
 
-conn = sqlite3.connect('jobs.db')
-cursor = conn.cursor()
+parser = argparse.ArgumentParser(description="Export jobs.db to CSV or NDJSON (gzip if the name ends in .gz)")
+parser.add_argument('path', nargs='?', default='jobs.csv')
+parser.add_argument('--format', choices=FORMATS, help="defaults to the file extension")
+delta = parser.add_mutually_exclusive_group()
+delta.add_argument('--run', type=int, help="only rows added or changed after this run (a run_id in the runs table)")
+delta.add_argument('--since', help="only rows with updated_at after this time (YYYY-MM-DD HH:MM:SS)")
+parser.add_argument('--force', action='store_true', help="write even if nothing changed since the last export")
+args = parser.parse_args()
 
-cursor.execute("SELECT * FROM jobs")
-jobs = cursor.fetchall()
+conn = setup_database()
+since = args.since
+if args.run is not None:
+    try:
+        since = run_started_at(conn, args.run)
+    except ValueError as e:
+        parser.error(str(e))
+count = export_jobs(conn, args.path, fmt=args.format, since=since, force=args.force)
 
-# Get column names
-column_names = [description[0] for description in cursor.description]
-
-# Write to CSV
-with open('jobs.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.writer(f)
-    writer.writerow(column_names)
-    writer.writerows(jobs)
-
-print(f"Exported {len(jobs)} jobs to jobs.csv")
+if count is None:
+    print(f"No changes since last export, {args.path} left as is")
+else:
+    print(f"Exported {count} jobs to {args.path}")
 
 conn.close()
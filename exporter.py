@@ -0,0 +1,129 @@
+import csv
+import gzip
+import io
+import json
+import os
+from facility_catalog import CATALOG_HASH_KEY
+
+# Rows are pulled from the cursor this many at a time, so memory stays
+# flat however large the jobs table gets
+CHUNK_SIZE = 1000
+
+FORMATS = ('csv', 'ndjson')
+
+# Columns left out of exports by default. last_seen moves on every run
+# without stamping updated_at, so it would make every export differ while
+# --since deltas never carried the new value
+EXCLUDED_COLUMNS = ('last_seen',)
+
+
+def detect_format(path):
+    """Format and compression implied by a file name such as jobs.ndjson.gz."""
+    name = path[:-3] if path.endswith('.gz') else path
+    fmt = 'ndjson' if name.endswith(('.ndjson', '.jsonl')) else 'csv'
+    return fmt, path.endswith('.gz')
+
+
+def jobs_fingerprint(conn, since=None, columns=()):
+    """Cheap summary of the jobs table that changes whenever a row does.
+
+    Every write path stamps updated_at, so comparing this against the last
+    export tells whether anything an export would contain has changed
+    without reading the rows. Facility names come from the catalog, so its
+    hash is included too.
+    """
+    count, updated, catalog = conn.execute(
+        "SELECT COUNT(*), MAX(updated_at), (SELECT value FROM meta WHERE key = ?) FROM jobs",
+        (CATALOG_HASH_KEY,)).fetchone()
+    return f"{count}|{updated}|{catalog}|{since}|{','.join(columns)}"
+
+
+def run_started_at(conn, run_id):
+    """started_at of a run in the runs table, the updated_at stamp of every
+    job it wrote; raises ValueError for an unknown run."""
+    row = conn.execute("SELECT started_at FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"No run {run_id} in the runs table")
+    return row[0]
+
+
+def export_columns(conn):
+    """job_details columns exported by default."""
+    return [row[1] for row in conn.execute("PRAGMA table_info(job_details)") if row[1] not in EXCLUDED_COLUMNS]
+
+
+def iter_rows(cursor, chunk_size=CHUNK_SIZE):
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def write_rows(f, fmt, columns, rows):
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+            f.write('\n')
+            count += 1
+    return count
+
+
+def export_jobs(conn, path, fmt=None, compress=None, since=None, force=False, columns=None, chunk_size=CHUNK_SIZE):
+    """Stream the jobs table (or only rows updated after `since`) to path.
+
+    Scrapers stamp everything a run writes with the run's started_at, so
+    since=run_started_at(conn, run_id) selects what later runs (and tools
+    run since) added or changed.
+
+    The format and gzip compression default to what the file name implies.
+    The file is written to a temporary name and moved into place, and the
+    export is skipped when the table has not changed since the last export
+    to the same path. `columns` defaults to export_columns(). Returns the
+    number of rows written, or None if skipped.
+    """
+    detected_fmt, detected_compress = detect_format(path)
+    fmt = fmt or detected_fmt
+    compress = detected_compress if compress is None else compress
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    columns = columns or export_columns(conn)
+    fingerprint = jobs_fingerprint(conn, since, columns)
+    if not force and os.path.exists(path):
+        row = conn.execute("SELECT fingerprint FROM exports WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == fingerprint:
+            return None
+
+    cursor = conn.cursor()
+    select = f"SELECT {', '.join(columns)} FROM job_details"
+    if since is None:
+        cursor.execute(f"{select} ORDER BY job_id")
+    else:
+        cursor.execute(f"{select} WHERE updated_at > ? ORDER BY updated_at, job_id", (since,))
+
+    tmp_path = f"{path}.tmp"
+    if compress:
+        raw = gzip.open(tmp_path, 'wb')
+        f = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+    else:
+        f = open(tmp_path, 'w', newline='', encoding='utf-8')
+    with f:
+        count = write_rows(f, fmt, columns, iter_rows(cursor, chunk_size))
+    os.replace(tmp_path, path)
+
+    with conn:
+        conn.execute("""
+        INSERT INTO exports (path, fingerprint, exported_at, row_count)
+        VALUES (?, ?, datetime('now', 'localtime'), ?)
+        ON CONFLICT(path) DO UPDATE SET fingerprint = excluded.fingerprint,
+            exported_at = excluded.exported_at, row_count = excluded.row_count
+        """, (path, fingerprint, count))
+    return count
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import re
+from database import create_job_details_view, index_jobs, rebuild_search_index, table_columns
+from facility_matcher import STATE_NAMES, facility_tokens, state_from_location
+
+PRISONS_PATH = 'prisons.txt'
+
+# meta key holding the SHA-256 of the prisons.txt the catalog was built from
+CATALOG_HASH_KEY = 'prisons_hash'
+
+# Longest names first so "West Virginia" wins over "Virginia"
+STATE_PATTERN = re.compile(r'\b(' + '|'.join(sorted(map(re.escape, STATE_NAMES.values()), key=len, reverse=True)) + r')\b')
+
+# "(CLOSED)", "(closed 2009)", "(Co-gender; closed)"
+CLOSED_PATTERN = re.compile(r'\((?:[^()]*;\s*)?closed\b[^()]*\)', re.IGNORECASE)
+
+# Other names a facility is listed under
+ALIAS_PATTERNS = (
+    re.compile(r'\(RENAMED\s*-\s*([^)]+)\)'),
+    re.compile(r'formerly known as ([^,(\[]+)'),
+)
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def clean_facility_name(line, standardize_dashes=True):
+    # Remove capacity, dates, operators, and status info
+    name = re.sub(r'\s*\([^)]*\)', '', line)  # Remove parentheses content
+    name = re.sub(r'\s*,\s*[A-Za-z\s]+$', '', name)  # Remove trailing location
+    if standardize_dashes:
+        name = re.sub(r'\s*–\s*', ' - ', name)
+    return name.strip()
+
+
+def parse_prisons(path=PRISONS_PATH):
+    """Facilities listed in prisons.txt, in file order.
+
+    Each is a dict with state, name, aliases (other names it is listed
+    under, including the name with its original en dashes) and closed.
+    """
+    with open(path, 'r') as f:
+        content = f.read()
+
+    facilities = []
+    current_state = None
+    for line in content.split('\n'):
+        line = line.strip()
+
+        # Skip empty lines
+        if not line:
+            continue
+
+        # Extract state from headers; sub-headers that name no state (such
+        # as Maryland's "Division of Correction") keep the current one
+        if line.startswith('List of ') or 'Department of' in line or 'Division of' in line:
+            state_match = STATE_PATTERN.search(line)
+            if state_match:
+                current_state = state_match.group(1)
+            continue
+
+        # Skip department headers and other non-facility lines
+        if any(skip in line for skip in ['Department', 'Division', 'Criminal Injuries', 'Emergency Number', 'Office of']):
+            continue
+
+        if len(line) <= 5 or line.startswith('List'):
+            continue
+        name = clean_facility_name(line)
+
+        # Skip if too short or contains unwanted text
+        if len(name) <= 5 or any(skip in name.lower() for skip in ['operated by', 'formerly known', 'including:']):
+            continue
+
+        aliases = []
+        for alias in [clean_facility_name(line, standardize_dashes=False)] + \
+                [match.group(1).strip() for pattern in ALIAS_PATTERNS for match in pattern.finditer(line)]:
+            if alias and alias != name and alias not in aliases:
+                aliases.append(alias)
+        facilities.append({
+            'state': current_state,
+            'name': name,
+            'aliases': aliases,
+            'closed': bool(CLOSED_PATTERN.search(line)),
+        })
+    return facilities
+
+
+# The write helpers below do not commit; callers wrap them in `with conn:`.
+
+def apply_catalog(conn, facilities, updated_at=None):
+    """Bring the facilities table in line with parsed facilities.
+
+    Rows are keyed by (state, name): new facilities are inserted, those
+    whose aliases or closed flag changed are updated, and facilities no
+    longer listed are deleted, with their jobs unverified. Unchanged rows
+    keep their id, so jobs keep pointing at them. Unverified jobs are
+    stamped with updated_at, or now.
+    Returns (added, updated, removed).
+    """
+    existing = {(state, name): (facility_id, aliases, closed)
+                for facility_id, state, name, aliases, closed
+                in conn.execute("SELECT id, state, name, aliases, closed FROM facilities")}
+    inserts = []
+    updates = []
+    seen = set()
+    for facility in facilities:
+        key = (facility['state'], facility['name'])
+        if key in seen:
+            continue
+        seen.add(key)
+        aliases = json.dumps(facility['aliases'], ensure_ascii=False)
+        closed = int(facility['closed'])
+        current = existing.get(key)
+        if current is None:
+            inserts.append((facility['state'], facility['name'], ' '.join(facility_tokens(facility['name'])), aliases, closed))
+        elif current[1:] != (aliases, closed):
+            updates.append((aliases, closed, current[0]))
+    removed = [(facility_id,) for key, (facility_id, _, _) in existing.items() if key not in seen]
+
+    conn.executemany("INSERT INTO facilities (state, name, tokens, aliases, closed) VALUES (?, ?, ?, ?, ?)", inserts)
+    conn.executemany("UPDATE facilities SET aliases = ?, closed = ? WHERE id = ?", updates)
+    unverified = [job_id for facility_id, in removed
+                  for job_id, in conn.execute("SELECT job_id FROM jobs WHERE facility_id = ?", (facility_id,))]
+    conn.executemany("UPDATE jobs SET facility_id = NULL, verified_facility = 0, "
+                     "updated_at = coalesce(?, datetime('now', 'localtime')) WHERE facility_id = ?",
+                     [(updated_at, facility_id) for facility_id, in removed])
+    conn.executemany("DELETE FROM facilities WHERE id = ?", removed)
+    index_jobs(conn, unverified)
+    return len(inserts), len(updates), len(removed)
+
+
+def sync_facilities(conn, path=PRISONS_PATH, updated_at=None):
+    """Rebuild the facilities catalog if prisons.txt changed since the last
+    build, and move jobs still naming their facility as text onto it.
+
+    Only the file hash is computed when nothing changed.
+    Returns (catalog hash, (added, updated, removed) or None).
+    """
+    catalog_hash = file_hash(path)
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (CATALOG_HASH_KEY,)).fetchone()
+    changes = None
+    if row is None or row[0] != catalog_hash:
+        changes = apply_catalog(conn, parse_prisons(path), updated_at)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (CATALOG_HASH_KEY, catalog_hash))
+    if 'facility_name_standard' in table_columns(conn, 'jobs'):
+        migrate_standard_names(conn)
+    return catalog_hash, changes
+
+
+def migrate_standard_names(conn):
+    """Point jobs at facilities by id instead of the facility_name_standard
+    text they were stored with, then drop that column.
+
+    Names resolve by the canonical name or an alias, preferring a facility
+    in the job's state.
+    """
+    by_name = {}
+    for facility_id, state, name, aliases in conn.execute("SELECT id, state, name, aliases FROM facilities ORDER BY id"):
+        for listed in [name] + json.loads(aliases or '[]'):
+            by_name.setdefault((state, listed), facility_id)
+            by_name.setdefault((None, listed), facility_id)
+
+    updates = []
+    for job_id, location, standard in conn.execute(
+            "SELECT job_id, location, facility_name_standard FROM jobs WHERE facility_name_standard IS NOT NULL"):
+        facility_id = by_name.get((state_from_location(location), standard)) or by_name.get((None, standard))
+        updates.append((facility_id, facility_id is not None, job_id))
+    conn.executemany("UPDATE jobs SET facility_id = ?, verified_facility = verified_facility AND ? WHERE job_id = ?", updates)
+    rebuild_search_index(conn)
+
+    conn.execute("DROP VIEW IF EXISTS job_details")
+    conn.execute("ALTER TABLE jobs DROP COLUMN facility_name_standard")
+    create_job_details_view(conn)
+    return len(updates)
+
@@ -0,0 +1,105 @@
+import re
+
+# Extraction rules, compiled once. Titles containing " - " take the part
+# after the first dash and apply DASH_CLEANUPS in order; other titles use
+# the first TITLE_PATTERNS match. DESCRIPTION_PATTERNS are the fallback for
+# jobs whose title names no facility.
+DASH_CLEANUPS = (
+    # Trailing codes such as " - (110/125)"
+    (r'\s*-\s*\([^)]+\)$', ''),
+    # Trailing " - CI/WC - (code)", but keep DC (Detention Center)
+    (r'\s*-\s*(?!DC)[A-Z]{2}(/[A-Z]{2})?\s*-\s*\([^)]+\)$', ''),
+)
+
+TITLE_PATTERNS = (
+    r'([A-Za-z\s]+County\s+(?:Jail|Sheriff|Detention|Correctional)[^,]*)',
+    r'([A-Za-z\s]+(?:Jail|Prison|Correctional|Detention)(?:\s+(?:Facility|Center|Institution))?)',
+    r'([A-Za-z\s]+(?:Penitentiary|Institution))',
+)
+
+DESCRIPTION_PATTERNS = (
+    r'at ([A-Za-z\s]+(?:County|State)\s+(?:Jail|Prison|Correctional|Institution))',
+    r'at ([A-Za-z\s]+(?:Correctional|Institution))',
+)
+
+# Applied to every extracted name
+ACRONYMS = (
+    (r'\bDC\b', 'Detention Center'),
+)
+
+# Titles repeat across runs and pages; the memo is dropped past this size
+MEMO_SIZE = 100000
+
+
+class FacilityExtractor:
+    """Pulls a facility name out of a job title or description.
+
+    Rules are compiled when the extractor is built, and title results are
+    memoized, so repeated titles cost a dict lookup.
+    """
+
+    def __init__(self, dash_cleanups=DASH_CLEANUPS, title_patterns=TITLE_PATTERNS,
+                 description_patterns=DESCRIPTION_PATTERNS, acronyms=ACRONYMS):
+        self.dash_cleanups = [(re.compile(pattern), repl) for pattern, repl in dash_cleanups]
+        self.title_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in title_patterns]
+        self.description_patterns = [re.compile(pattern) for pattern in description_patterns]
+        self.acronyms = [(re.compile(pattern), repl) for pattern, repl in acronyms]
+        self._memo = {}
+
+    def extract(self, title):
+        if not title:
+            return None
+        try:
+            return self._memo[title]
+        except KeyError:
+            pass
+        if len(self._memo) >= MEMO_SIZE:
+            self._memo.clear()
+        result = self._memo[title] = self._extract_title(title)
+        return result
+
+    def extract_many(self, titles):
+        return [self.extract(title) for title in titles]
+
+    def extract_from_description(self, description):
+        if not description:
+            return None
+        for pattern in self.description_patterns:
+            match = pattern.search(description)
+            if match:
+                return match.group(1).strip()
+        return None
+
+    def _extract_title(self, title):
+        if ' - ' in title:
+            name = title.split(' - ', 1)[1]
+            for pattern, repl in self.dash_cleanups:
+                name = pattern.sub(repl, name)
+            return self._expand(name).strip()
+
+        for pattern in self.title_patterns:
+            match = pattern.search(title)
+            if match:
+                return self._expand(match.group(1).strip())
+        return None
+
+    def _expand(self, name):
+        for pattern, repl in self.acronyms:
+            name = pattern.sub(repl, name)
+        return name
+
+
+# Shared by both scrapers, so the memo carries across a run
+extractor = FacilityExtractor()
+
+
+def extract_facility_name(title):
+    return extractor.extract(title)
+
+
+def extract_many(titles):
+    return extractor.extract_many(titles)
+
+
+def extract_facility_from_description(description):
+    return extractor.extract_from_description(description)
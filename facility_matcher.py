@@ -0,0 +1,323 @@
+import json
+import os
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from difflib import SequenceMatcher
+
+MATCH_THRESHOLD = 0.7
+
+# Entries must share this Dice fraction of trigrams with a name before
+# SequenceMatcher scores them. At 0.25 results equal a full scan on the
+# benchmark corpus; at 0.3 a few weak matches are already missed
+QGRAM_SIZE = 3
+QGRAM_THRESHOLD = float(os.environ.get('QGRAM_THRESHOLD', 0.25))
+
+STATE_NAMES = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'FL': 'Florida', 'GA': 'Georgia',
+    'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa',
+    'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana', 'ME': 'Maine', 'MD': 'Maryland',
+    'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota', 'MS': 'Mississippi', 'MO': 'Missouri',
+    'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada', 'NH': 'New Hampshire', 'NJ': 'New Jersey',
+    'NM': 'New Mexico', 'NY': 'New York', 'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio',
+    'OK': 'Oklahoma', 'OR': 'Oregon', 'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina',
+    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont',
+    'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming',
+    'DC': 'District of Columbia',
+}
+_STATES_BY_NAME = {name.lower(): name for name in STATE_NAMES.values()}
+
+
+def normalize_state(value):
+    """Full state name for a code ("TX") or name ("texas"), else None."""
+    if not value:
+        return None
+    value = value.strip()
+    return STATE_NAMES.get(value.upper()) or _STATES_BY_NAME.get(value.lower())
+
+
+def state_from_location(location):
+    """State of a "City, ST" location, else None."""
+    if not location or ',' not in location:
+        return None
+    return normalize_state(location.rsplit(',', 1)[1])
+
+
+def facility_tokens(name):
+    """Lowercase words of a facility name, without punctuation."""
+    return re.findall(r'[a-z0-9]+', name.lower())
+
+
+def qgrams(text, size=QGRAM_SIZE):
+    """size-grams of text, each numbered by its occurrence so repeats count
+    separately. Longer grams are taken from text padded with a space at
+    each end, so words at the edges get as many as the rest."""
+    padded = f" {text} " if size > 1 else text
+    seen = Counter()
+    grams = []
+    for i in range(len(padded) - size + 1):
+        gram = padded[i:i + size]
+        seen[gram] += 1
+        grams.append((gram, seen[gram]))
+    return grams
+
+
+class FacilityMatcher:
+    """Fuzzy matcher over the master facility list.
+
+    Scores names with SequenceMatcher against a 0.7 threshold like a scan
+    of every master facility, but each query only scores a shortlist. A
+    trigram inverted index counts the trigrams every entry of a plausible
+    length shares with the query, and only entries whose trigram Dice
+    coefficient reaches QGRAM_THRESHOLD are kept (count filtering). Those
+    are then scored best character bound first, stopping once no bound can
+    beat the best score found.
+    """
+
+    def __init__(self, facilities, threshold=MATCH_THRESHOLD):
+        self.facilities = list(facilities)
+        self.threshold = threshold
+
+        lowered = [facility.lower() for facility in self.facilities]
+        # Entries are kept sorted by length so a query can bisect to the
+        # window of lengths that can still reach the threshold
+        self._order = sorted(range(len(lowered)), key=lambda i: len(lowered[i]))
+        self._names = [lowered[i] for i in self._order]
+        self._lengths = [len(name) for name in self._names]
+
+        # Inverted indexes of (trigram or character, occurrence) -> sorted
+        # positions: the postings an entry appears in count what it shares
+        self._postings = {}
+        self._char_postings = {}
+        for pos, name in enumerate(self._names):
+            for gram in qgrams(name):
+                self._postings.setdefault(gram, []).append(pos)
+            for char in qgrams(name, 1):
+                self._char_postings.setdefault(char, []).append(pos)
+
+        # SequenceMatcher caches its analysis of the second sequence, so one
+        # matcher per master entry is reused across queries
+        self._matchers = {}
+        self._results = {}
+
+    def match(self, facility_name):
+        key = facility_name.lower()
+        result = self._results.get(key)
+        if result is None:
+            result = self._score(key)
+            self._results[key] = result
+        return result
+
+    def match_many(self, names):
+        return [self.match(name) if name else (None, 0) for name in names]
+
+    def _score(self, query):
+        query_len = len(query)
+        threshold = self.threshold
+
+        # A ratio of 2*M/(a+b) can only beat the threshold when the shorter
+        # string is long enough relative to the longer one
+        lo = bisect_right(self._lengths, query_len * threshold / (2 - threshold) - 1)
+        hi = bisect_left(self._lengths, query_len * (2 - threshold) / threshold + 1)
+        if lo >= hi:
+            return None, 0
+
+        grams = qgrams(query)
+        shared = self._count_shared(self._postings, grams, lo, hi)
+        shared_chars = self._count_shared(self._char_postings, qgrams(query, 1), lo, hi)
+
+        # Trigram Dice is 2 * shared / (query trigrams + entry trigrams).
+        # An entry of length n is padded to n + 2, so it has
+        # n + 3 - QGRAM_SIZE of them
+        candidates = []
+        for pos, common_grams in shared.items():
+            length = self._lengths[pos]
+            entry_grams = length + 3 - QGRAM_SIZE
+            if 2 * common_grams < QGRAM_THRESHOLD * (len(grams) + entry_grams):
+                continue
+            # Matching blocks can never pair more characters than the two
+            # strings have in common, which bounds the ratio from above
+            bound = 2.0 * shared_chars[pos] / (query_len + length)
+            if bound > threshold:
+                candidates.append((-bound, self._order[pos], pos))
+        candidates.sort()
+
+        best_match = None
+        best_score = 0
+        best_index = None
+        for neg_bound, index, pos in candidates:
+            if -neg_bound < best_score:
+                break
+            matcher = self._matchers.get(pos)
+            if matcher is None:
+                matcher = SequenceMatcher(None, '', self._names[pos])
+                self._matchers[pos] = matcher
+            matcher.set_seq1(query)
+            score = matcher.ratio()
+            if score <= threshold:
+                continue
+            # Ties go to the entry listed first, as in a linear scan
+            if score > best_score or (score == best_score and index < best_index):
+                best_score = score
+                best_match = self.facilities[index]
+                best_index = index
+
+        return best_match, best_score
+
+    @staticmethod
+    def _count_shared(postings, grams, lo, hi):
+        """Grams each entry in positions [lo, hi) shares with a query."""
+        shared = Counter()
+        for gram in grams:
+            positions = postings.get(gram)
+            if positions:
+                shared.update(positions[bisect_left(positions, lo):bisect_left(positions, hi)])
+        return shared
+
+
+class StateMatcher:
+    """Facility matching restricted to the job's state.
+
+    A name is first matched against the facilities listed under its state
+    only, which is both much cheaper than the full list and avoids
+    matching a similarly named facility in another state. If the state is
+    unknown or has no match, the full list is searched as before.
+    """
+
+    def __init__(self, master_list, threshold=MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.by_state = {}
+        for state, facility in master_list:
+            if state:
+                self.by_state.setdefault(state, []).append(facility)
+        self._all = [facility for _, facility in master_list]
+        self._matchers = {}
+
+    def _matcher(self, state):
+        matcher = self._matchers.get(state)
+        if matcher is None:
+            facilities = self.by_state[state] if state else self._all
+            matcher = self._matchers[state] = FacilityMatcher(facilities, self.threshold)
+        return matcher
+
+    def match(self, facility_name, state=None):
+        state = normalize_state(state)
+        if state in self.by_state:
+            result = self._matcher(state).match(facility_name)
+            if result[0] is not None:
+                return result
+        return self._matcher(None).match(facility_name)
+
+    def match_many(self, names, states=None):
+        states = states or [None] * len(names)
+        return [self.match(name, state) if name else (None, 0) for name, state in zip(names, states)]
+
+
+class CatalogMatcher:
+    """StateMatcher over facilities catalog rows (id, state, name, tokens,
+    aliases), as read by load_catalog.
+
+    match() returns (facility_id, score). Names whose words equal a
+    facility's name tokens match it outright; the rest are matched fuzzily
+    against facility names and aliases. Needs no database connection, so
+    it can be built in worker processes.
+    """
+
+    def __init__(self, facilities, threshold=MATCH_THRESHOLD):
+        master_list = []
+        self._ids = {}
+        self._exact = {}
+        for facility_id, state, name, tokens, aliases in facilities:
+            for listed in [name] + json.loads(aliases or '[]'):
+                master_list.append((state, listed))
+                self._ids.setdefault((state, listed), facility_id)
+                self._ids.setdefault((None, listed), facility_id)
+            self._exact.setdefault((state, tokens), facility_id)
+            self._exact.setdefault((None, tokens), facility_id)
+        self._matcher = StateMatcher(master_list, threshold)
+
+    def match(self, facility_name, state=None):
+        state = normalize_state(state)
+        tokens = ' '.join(facility_tokens(facility_name))
+        facility_id = self._exact.get((state, tokens)) or self._exact.get((None, tokens))
+        if facility_id is not None:
+            return facility_id, 1.0
+        match, score = self._matcher.match(facility_name, state)
+        if match is None:
+            return None, score
+        return self._ids.get((state, match)) or self._ids[(None, match)], score
+
+
+def load_catalog(conn):
+    return conn.execute("SELECT id, state, name, tokens, aliases FROM facilities ORDER BY id").fetchall()
+
+
+class CachedMatcher:
+    """CatalogMatcher backed by the facility_matches table in jobs.db.
+
+    match() returns (facility_id, score). Results are cached per (raw
+    name, state) and tied to the catalog hash, so any change to the
+    catalog invalidates the cache. The catalog is only loaded on a miss.
+    """
+
+    def __init__(self, conn, fingerprint):
+        self.conn = conn
+        self.fingerprint = fingerprint
+        self._matcher = None
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM facility_matches WHERE master_hash != ?", (fingerprint,))
+        cursor.execute("SELECT facility_name_raw, state, facility_id, score FROM facility_matches")
+        self._cache = {(raw, state): (facility_id, score) for raw, state, facility_id, score in cursor.fetchall()}
+        cursor.execute("SELECT id, name FROM facilities")
+        self.names = dict(cursor.fetchall())
+
+    @staticmethod
+    def key(facility_name, state=None):
+        # Unknown states are stored as '' so they stay part of the key
+        return facility_name, normalize_state(state) or ''
+
+    def cached(self, facility_name, state=None):
+        """Cached result for a name, or None if it has not been matched."""
+        return self._cache.get(self.key(facility_name, state))
+
+    def add(self, results):
+        """Cache {(facility_name, state): (facility_id, score)} results
+        matched elsewhere, e.g. by a CatalogMatcher in another process."""
+        for (facility_name, state), result in results.items():
+            key = self.key(facility_name, state)
+            self._cache[key] = result
+            self._pending[key] = result
+
+    def match(self, facility_name, state=None):
+        key = self.key(facility_name, state)
+        result = self._cache.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        if self._matcher is None:
+            self._matcher = CatalogMatcher(load_catalog(self.conn))
+        result = self._matcher.match(facility_name, key[1] or None)
+        self._cache[key] = result
+        self._pending[key] = result
+        return result
+
+    def match_many(self, names, states=None):
+        states = states or [None] * len(names)
+        return [self.match(name, state) if name else (None, 0) for name, state in zip(names, states)]
+
+    def save(self):
+        if not self._pending:
+            return
+        self.conn.executemany('''
+        INSERT OR REPLACE INTO facility_matches (facility_name_raw, state, facility_id, score, master_hash)
+        VALUES (?, ?, ?, ?, ?)
+        ''', [(raw, state, facility_id, score, self.fingerprint)
+              for (raw, state), (facility_id, score) in self._pending.items()])
+        self._pending = {}
@@ -0,0 +1,101 @@
+import re
+from html.parser import HTMLParser
+
+# Recorded with every description clean_html produced. Cleaned text has
+# lost the markup it was cleaned from, so it is never cleaned again: only
+# descriptions stored raw (no version) are picked up by clean_descriptions.py
+CLEANER_VERSION = 1
+
+# A tag, comment or entity; text without any is already plain
+MARKUP = re.compile(r'<[a-zA-Z/!]|&(#[0-9]+|#[xX][0-9a-fA-F]+|[a-zA-Z]+);')
+
+# Tags that start a new paragraph, a new line, or whose text is dropped
+BLOCK_TAGS = frozenset((
+    'p', 'div', 'section', 'article', 'header', 'footer', 'ul', 'ol', 'dl', 'table',
+    'blockquote', 'pre', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+))
+LINE_TAGS = frozenset(('br', 'li', 'tr', 'dt', 'dd'))
+SKIPPED_TAGS = frozenset(('script', 'style', 'head', 'title'))
+
+
+class HTMLToText(HTMLParser):
+    """Incremental HTML-to-text converter.
+
+    Text is produced in one pass as tags arrive: block elements become
+    paragraphs separated by a blank line, <br>/<li>/<tr> start a new line,
+    list items are prefixed with "- ", entities are decoded and runs of
+    whitespace within a line collapse to one space. feed() may be called
+    with any number of chunks; get_text() returns the result so far.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines = []
+        self.current = []
+        self.bullet = False
+        self.skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skipping += 1
+        elif tag == 'li':
+            self._end_line()
+            self.bullet = True
+        elif tag in BLOCK_TAGS:
+            self._end_line(paragraph=True)
+        elif tag in LINE_TAGS:
+            self._end_line()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in LINE_TAGS or tag in BLOCK_TAGS:
+            self._end_line()
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in BLOCK_TAGS:
+            self._end_line(paragraph=True)
+        elif tag in LINE_TAGS:
+            self._end_line()
+            self.bullet = False
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.current.append(data)
+
+    def _end_line(self, paragraph=False):
+        line = ' '.join(''.join(self.current).split())
+        self.current = []
+        if line:
+            self.lines.append(f"- {line}" if self.bullet else line)
+            self.bullet = False
+        if paragraph and self.lines and self.lines[-1]:
+            self.lines.append('')
+
+    def get_text(self):
+        self._end_line()
+        return '\n'.join(self.lines).strip('\n')
+
+
+def clean_text(text):
+    """Collapse whitespace within the lines of plain text and runs of blank
+    lines, keeping its line breaks."""
+    lines = []
+    for line in text.splitlines():
+        line = ' '.join(line.split())
+        if line or (lines and lines[-1]):
+            lines.append(line)
+    return '\n'.join(lines).strip('\n')
+
+
+def clean_html(text):
+    if not text:
+        return text
+    if not MARKUP.search(text):
+        # Plain text, such as rendered page text: its line breaks are
+        # structure, not HTML whitespace to collapse
+        return clean_text(text)
+    parser = HTMLToText()
+    parser.feed(text)
+    parser.close()
+    return parser.get_text()
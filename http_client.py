@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+CACHE_DIR = os.environ.get('HTTP_CACHE_DIR', '.http_cache')
+# Seconds a cached response is served without asking the server again
+CACHE_TTL = float(os.environ.get('HTTP_CACHE_TTL', 0))
+CACHE_MAX_BYTES = int(os.environ.get('HTTP_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+POOL_SIZE = 16
+
+# Response headers kept alongside cached bodies
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class CachedSession:
+    """Keep-alive requests.Session with an on-disk response cache.
+
+    A cached response younger than its TTL is returned without touching
+    the network. Older entries are revalidated with If-None-Match /
+    If-Modified-Since, and a 304 is answered from disk. The cache is
+    trimmed oldest-first once it grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, pool_size=POOL_SIZE):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.cache_bytes = sum(entry.stat().st_size for entry in os.scandir(cache_dir) if entry.is_file())
+
+    def get(self, url, params=None, timeout=30, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        path = os.path.join(self.cache_dir, hashlib.sha256(full_url.encode()).hexdigest())
+        meta, body = self._load(path)
+
+        headers = {}
+        if meta:
+            if time.time() - meta['stored_at'] < ttl:
+                self.hits += 1
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return self._response(full_url, meta, body)
+            if meta['headers'].get('ETag'):
+                headers['If-None-Match'] = meta['headers']['ETag']
+            if meta['headers'].get('Last-Modified'):
+                headers['If-Modified-Since'] = meta['headers']['Last-Modified']
+
+        response = self.session.get(full_url, headers=headers, timeout=timeout)
+
+        if response.status_code == 304 and meta:
+            self.revalidated += 1
+            meta['stored_at'] = time.time()
+            self._store(path, meta, body)
+            return self._response(full_url, meta, body)
+
+        self.misses += 1
+        if response.status_code == 200:
+            meta = {
+                'url': full_url,
+                'stored_at': time.time(),
+                'headers': {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+            }
+            self._store(path, meta, response.content)
+        return response
+
+    def _load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def _store(self, path, meta, body):
+        data = json.dumps(meta).encode() + b'\n' + body
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        with self.lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self.cache_bytes += len(data) - old_size
+            if self.cache_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                         for entry in os.scandir(self.cache_dir)
+                         if entry.is_file() and not entry.name.endswith('.tmp'))
+        for _, size, path in entries:
+            if self.cache_bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.cache_bytes -= size
+
+    def _response(self, url, meta, body):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = body
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers) or 'utf-8'
+        return response
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = CachedSession()
+        return _session
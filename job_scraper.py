@@ -1,29 +1,65 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import sqlite3
+from selenium.common.exceptions import TimeoutException
 from datetime import datetime, timedelta
-import time
+import argparse
 import logging
 import os
+from browser_pool import POOL_RATE, POOL_SIZE, fetch_descriptions, new_driver, wait
+from database import (load_job_hashes, pending_descriptions, queue_descriptions, record_description_failures,
+                      record_run, setup_database, sync_jobs, update_descriptions, update_facilities)
+from facility_extractor import FacilityExtractor, extract_facility_from_description, extract_facility_name
+from facility_catalog import sync_facilities
+from facility_matcher import CachedMatcher, FacilityMatcher, state_from_location
+from html_cleaner import CLEANER_VERSION
+from metrics import PhaseTimer, setup_logging
+from profiling import add_profile_arguments, run_with_profiling
 
 # Setup logging
-log_dir = 'logs'
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-log_file = os.path.join(log_dir, f'scraper_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler()
-    ]
-)
+log_file = setup_logging('job_scraper')
 logger = logging.getLogger(__name__)
 
+# Scraped descriptions are written in batches of this many per transaction
+DESCRIPTION_BATCH_SIZE = 25
+
+# Listing waits (see browser_pool for polling): the Load More button, then
+# the next batch of cards
+BUTTON_TIMEOUT = float(os.environ.get('BROWSER_BUTTON_TIMEOUT', 2))
+LOAD_MORE_TIMEOUT = float(os.environ.get('BROWSER_LOAD_MORE_TIMEOUT', 15))
+
+SEARCH_URL = "https://careers.aramark.com/search/?distance=25&category=&type=&sub_category=&industry=correctional+facilities#page-top"
+
+# Title heading of each job card in the search results
+CARD_SELECTOR = "h2.Search--results__card__title"
+
+# Reads every job card in one round trip to chromedriver instead of several
+# find_element calls per card. Mirrors the old per-card lookups: the link in
+# the title heading, the posted text in the card's div.flex and the location
+# paragraph, which some cards lack.
+CARD_SCRIPT = """
+return Array.from(document.querySelectorAll(arguments[0])).slice(arguments[1]).map(function (heading) {
+    var link = heading.querySelector('a');
+    var card = heading.parentElement && heading.parentElement.parentElement;
+    var posted = card && card.querySelector('div.flex p.text-xs');
+    var location = card && card.querySelector('p.Search--results__card__location');
+    return {
+        title: link ? link.innerText.trim() : '',
+        href: link ? link.href : '',
+        posted: posted ? posted.innerText.trim() : '',
+        location: location ? location.innerText.trim() : ''
+    };
+});
+"""
+
+# Clicks Load More if it is shown and enabled; returns whether it did
+LOAD_MORE_SCRIPT = """
+var button = document.getElementById('loadMore');
+if (!button || button.disabled || button.offsetParent === null) return false;
+button.scrollIntoView();
+button.click();
+return true;
+"""
+
 def calculate_posted_date(posted_text):
     if "days ago" in posted_text:
         days = int(posted_text.split()[1])
@@ -32,252 +68,203 @@ def calculate_posted_date(posted_text):
         return datetime.now() - timedelta(days=1)
     return datetime.now()
 
-def extract_facility_name(title):
-    import re
-    
-    # Pattern 1: After dash (most common)
-    if ' - ' in title:
-        after_dash = title.split(' - ', 1)[1]
-        # Remove codes like (110/125) or CI/WC but keep DC (Detention Center)
-        after_dash = re.sub(r'\s*-\s*\([^)]+\)$', '', after_dash)
-        after_dash = re.sub(r'\s*-\s*(?!DC)[A-Z]{2}(/[A-Z]{2})?\s*-\s*\([^)]+\)$', '', after_dash)
-        # Convert DC acronym to full name
-        after_dash = re.sub(r'\bDC\b', 'Detention Center', after_dash)
-        return after_dash.strip()
-    
-    # Pattern 2: Direct facility names with keywords
-    patterns = [
-        r'([A-Za-z\s]+County\s+(?:Jail|Sheriff|Detention|Correctional)[^,]*)',
-        r'([A-Za-z\s]+(?:Jail|Prison|Correctional|Detention)(?:\s+(?:Facility|Center|Institution))?)',
-        r'([A-Za-z\s]+(?:Penitentiary|Institution))',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, title, re.IGNORECASE)
-        if match:
-            result = match.group(1).strip()
-            # Convert DC acronym to full name
-            result = re.sub(r'\bDC\b', 'Detention Center', result)
-            return result
-    
-    return None
+def card_count(driver):
+    return driver.execute_script("return document.querySelectorAll(arguments[0]).length;", CARD_SELECTOR)
 
-def load_master_facilities():
-    facilities = []
-    with open('clean_prisons.txt', 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line and ':' not in line and len(line) > 5:
-                facilities.append(line)
-    return facilities
+def extract_cards(driver, start=0):
+    """Title, href, posted text and location of every listed job card from
+    index start on."""
+    return driver.execute_script(CARD_SCRIPT, CARD_SELECTOR, start)
 
-def find_best_match(facility_name, master_list):
-    from difflib import SequenceMatcher
-    best_match = None
-    best_score = 0
-    
-    for master_facility in master_list:
-        score = SequenceMatcher(None, facility_name.lower(), master_facility.lower()).ratio()
-        if score > best_score and score > 0.7:
-            best_score = score
-            best_match = master_facility
-    
-    return best_match, best_score
+def iter_card_batches(driver):
+    """Yield the job cards of the search page a Load More batch at a time.
 
-def setup_database():
-    conn = sqlite3.connect('jobs.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS jobs (
-        job_id TEXT PRIMARY KEY,
-        title TEXT,
-        url TEXT,
-        location TEXT,
-        posted_date DATE,
-        description TEXT,
-        facility_name_raw TEXT,
-        facility_name_standard TEXT,
-        verified_facility BOOLEAN
-    )
-    ''')
-    conn.commit()
-    return conn
+    Load More is clicked before each batch is handed over, so the next
+    batch loads in the browser while the caller processes this one. The
+    wait for it polls the card count and ends as soon as new cards render.
+    """
+    wait(driver).until(EC.presence_of_element_located((By.CSS_SELECTOR, CARD_SELECTOR)))
+    listed = 0
+    while True:
+        cards = extract_cards(driver, listed)
+        listed += len(cards)
+        try:
+            wait(driver, BUTTON_TIMEOUT).until(lambda d: d.execute_script(LOAD_MORE_SCRIPT))
+            more = True
+        except TimeoutException:
+            logger.info("No Load More button found")
+            more = False
+        if cards:
+            yield cards
+        if not more:
+            return
+        try:
+            wait(driver, LOAD_MORE_TIMEOUT).until(lambda d: card_count(d) > listed)
+        except TimeoutException:
+            logger.info("No more jobs to load")
+            return
+
+def now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
 def scrape_all_jobs():
+    timer = PhaseTimer()
+    started_at = now()
     conn = setup_database()
     cursor = conn.cursor()
     
     logger.info("Starting job scraper")
     
     # Load master facility list
-    master_facilities = load_master_facilities()
-    logger.info(f"Loaded {len(master_facilities)} master facilities")
+    with conn:
+        catalog_hash, changes = sync_facilities(conn, updated_at=started_at)
+    if changes:
+        added, updated, removed = changes
+        logger.info(f"Facility catalog rebuilt from prisons.txt: {added} added, {updated} updated, {removed} removed")
+    matcher = CachedMatcher(conn, catalog_hash)
+    logger.info(f"Loaded {len(matcher.names)} catalog facilities")
     
-    # Setup Chrome options for GitHub Actions compatibility
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless=new')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--window-size=1920,1080')
-    options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    with timer.phase('listing_fetch'):
+        driver = new_driver()
+        driver.get(SEARCH_URL)
     
-    driver = webdriver.Chrome(options=options)
-    driver.get("https://careers.aramark.com/search/?distance=25&category=&type=&sub_category=&industry=correctional+facilities#page-top")
+    known = load_job_hashes(conn)
+    listed_ids = set()
+    new_job_ids = []
+    changed_job_ids = []
+    seen_at = started_at
     
-    # First, click Load More until we have 100 jobs
-    while True:
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(2)
+    def process_card(card):
+        title = card['title']
+        url = card['href']
+        job_id = url.split("req_id=")[1] if "req_id=" in url else ""
+        if not job_id:
+            logger.warning(f"Skipping card without a job id: {title} ({url or 'no link'})")
+            return None
+        posted_date = calculate_posted_date(card['posted'])
+        location = card['location']
+        if job_id in listed_ids:
+            logger.info(f"Skipping duplicate: {job_id}")
+            return None
+        listed_ids.add(job_id)
         
-        try:
-            current_count = len(driver.find_elements(By.CSS_SELECTOR, "h2.Search--results__card__title"))
-            
-            if current_count >= 100:
-                logger.info(f"Reached 100+ jobs ({current_count}), stopping Load More")
-                break
-                
-            load_more = WebDriverWait(driver, 5).until(
-                EC.element_to_be_clickable((By.ID, "loadMore"))
-            )
-            logger.info(f"Found {current_count} jobs. Clicking Load More...")
-            driver.execute_script("arguments[0].click();", load_more)
-            time.sleep(5)
-            
-            new_count = len(driver.find_elements(By.CSS_SELECTOR, "h2.Search--results__card__title"))
-            logger.info(f"After Load More: {new_count} jobs")
-            
-            if new_count <= current_count:
-                logger.info("No more jobs to load")
-                break
-        except:
-            logger.info("No Load More button found")
-            break
-    
-    # Wait for page to fully load
-    time.sleep(3)
-    
-    # Now scrape all jobs at once
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_element_located((By.CLASS_NAME, "Search--results__card__title"))
-    )
-    
-    job_cards = driver.find_elements(By.CSS_SELECTOR, "h2.Search--results__card__title")
-    logger.info(f"Total jobs found: {len(job_cards)}")
-    
-    # Process only first 100 jobs
-    for i, card in enumerate(job_cards[:100]):
-        if i >= 100:
-            break
-        try:
-            link = card.find_element(By.TAG_NAME, "a")
-            title = link.text
-            url = link.get_attribute("href")
-            job_id = url.split("req_id=")[1] if "req_id=" in url else ""
-            
-            parent = card.find_element(By.XPATH, "../..")
-            info_div = parent.find_element(By.CSS_SELECTOR, "div.flex")
-            posted_text = info_div.find_element(By.CSS_SELECTOR, "p.text-xs").text
-            
-            # Get location from the specific class
-            try:
-                location_element = parent.find_element(By.CSS_SELECTOR, "p.Search--results__card__location")
-                location = location_element.text.strip()
-            except:
-                location = ""
-            
-            posted_date = calculate_posted_date(posted_text)
-            
+        with timer.phase('extraction'):
             facility_name_raw = extract_facility_name(title)
-            
-            # Match against master list
-            facility_name_standard = None
-            verified = False
-            if facility_name_raw:
-                match, score = find_best_match(facility_name_raw, master_facilities)
-                if match:
-                    facility_name_standard = match
-                    verified = True
-            
-            cursor.execute("SELECT job_id FROM jobs WHERE job_id = ?", (job_id,))
-            if not cursor.fetchone():
-                cursor.execute('''
-                INSERT INTO jobs (job_id, title, url, location, posted_date, facility_name_raw, facility_name_standard, verified_facility)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (job_id, title, url, location, posted_date.strftime('%Y-%m-%d'), facility_name_raw, facility_name_standard, verified))
-                
-                if verified:
-                    logger.info(f"Scraped: {title} - {job_id} [✓ {facility_name_standard}]")
-                elif facility_name_raw:
-                    logger.info(f"Scraped: {title} - {job_id} [? {facility_name_raw}]")
-                else:
-                    logger.info(f"Scraped: {title} - {job_id} [No facility found]")
+        
+        # Match against master list
+        facility_id = None
+        verified = False
+        if facility_name_raw:
+            with timer.phase('matching'):
+                facility_id, score = matcher.match(facility_name_raw, state_from_location(location))
+            verified = facility_id is not None
+        
+        if job_id not in known:
+            if verified:
+                logger.info(f"Scraped: {title} - {job_id} [✓ {matcher.names[facility_id]}]")
+            elif facility_name_raw:
+                logger.info(f"Scraped: {title} - {job_id} [? {facility_name_raw}]")
             else:
-                logger.info(f"Skipping duplicate: {job_id}")
-            
-        except Exception as e:
-            logger.error(f"Error scraping job: {e}")
+                logger.info(f"Scraped: {title} - {job_id} [No facility found]")
+        else:
+            logger.info(f"Skipping duplicate: {job_id}")
+        return (job_id, title, url, location, posted_date.strftime('%Y-%m-%d'), facility_name_raw, facility_id, verified)
     
-    conn.commit()
+    # Cards are processed and saved a batch at a time while the next batch
+    # loads. Load More stops at a slow page as well as at the end of the
+    # list, so jobs missing from the browser listing are not closed. Known
+    # jobs are left as they are: the posted date and url read from a card
+    # are derived and would overwrite the API's values.
+    for cards in timer.timed(iter_card_batches(driver), 'listing_fetch'):
+        listed_rows = []
+        for card in cards:
+            try:
+                row = process_card(card)
+            except Exception as e:
+                logger.error(f"Error scraping job: {e}")
+                continue
+            if row:
+                listed_rows.append(row)
+        with timer.phase('db_write'), conn:
+            matcher.save()
+            new_ids, changed_ids, _ = sync_jobs(conn, listed_rows, seen_at, known=known, close_missing=False,
+                                                update_known=False)
+            queue_descriptions(conn, new_ids)
+        new_job_ids.extend(new_ids)
+        changed_job_ids.extend(changed_ids)
+        logger.info(f"Saved {len(listed_rows)} jobs ({len(listed_ids)} listed so far)")
+    logger.info(f"Total jobs found: {len(listed_ids)}")
     logger.info("Finished scraping job listings")
+    driver.quit()
+    logger.info(f"Facility match cache: {matcher.hits} hits, {matcher.misses} misses")
     
-    # Scrape descriptions
-    cursor.execute("SELECT job_id, url FROM jobs WHERE description IS NULL OR description = ''")
-    jobs = cursor.fetchall()
+    # Scrape descriptions of queued jobs, including any left by an
+    # interrupted run
+    jobs = pending_descriptions(conn)
+    
+    description_updates = []
+    facility_updates = []
+    failures = []
+    descriptions_updated = 0
     
-    for job_id, url in jobs:
+    def flush_descriptions():
+        with timer.phase('db_write'), conn:
+            matcher.save()
+            update_facilities(conn, facility_updates, updated_at=started_at)
+            # Selenium returns rendered text, which needs no HTML cleaning
+            update_descriptions(conn, description_updates, cleaned_version=CLEANER_VERSION, updated_at=started_at)
+            record_description_failures(conn, failures)
+        facility_updates.clear()
+        description_updates.clear()
+        failures.clear()
+    
+    # Job pages load in a pool of browsers; all writes stay on this thread
+    logger.info(f"Getting descriptions for {len(jobs)} jobs with {POOL_SIZE} browsers")
+    pending = {job_id: (location, current_facility) for job_id, url, location, current_facility in jobs}
+    fetched = fetch_descriptions([(job_id, url) for job_id, url, _, _ in jobs], size=POOL_SIZE, rate=POOL_RATE)
+    for job_id, description, error in timer.timed(fetched, 'description_fetch'):
+        if error:
+            logger.error(f"Error getting description for {job_id}: {error}")
+            failures.append((job_id, error))
+            if len(failures) >= DESCRIPTION_BATCH_SIZE:
+                flush_descriptions()
+            continue
+        location, current_facility = pending[job_id]
         try:
-            logger.info(f"Getting description for {job_id}")
-            driver.get(url)
-            
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, "//h2[text()='Job Description']"))
-            )
-            
-            desc_header = driver.find_element(By.XPATH, "//h2[text()='Job Description']")
-            desc_container = desc_header.find_element(By.XPATH, "../following-sibling::div")
-            description = desc_container.text.strip()
+            logger.info(f"Got description for {job_id}")
+            description_updates.append((job_id, description))
+            descriptions_updated += 1
             
             # Check if facility name is missing and try to extract from description
-            cursor.execute("SELECT facility_name_raw FROM jobs WHERE job_id = ?", (job_id,))
-            current_facility = cursor.fetchone()[0]
-            
             if not current_facility:
-                # Extract facility name from description with better parsing
-                import re
-                facility_match = re.search(r'at ([A-Za-z\s]+(?:County|State)\s+(?:Jail|Prison|Correctional|Institution))', description)
-                if not facility_match:
-                    facility_match = re.search(r'at ([A-Za-z\s]+(?:Correctional|Institution))', description)
-                
-                facility_from_desc = facility_match.group(1).strip() if facility_match else None
+                with timer.phase('extraction'):
+                    facility_from_desc = extract_facility_from_description(description)
                 
                 # Match description facility against master list
-                standard_from_desc = None
+                facility_id_from_desc = None
                 verified_from_desc = False
                 if facility_from_desc:
-                    match, score = find_best_match(facility_from_desc, master_facilities)
-                    if match:
-                        standard_from_desc = match
-                        verified_from_desc = True
+                    with timer.phase('matching'):
+                        facility_id_from_desc, score = matcher.match(facility_from_desc, state_from_location(location))
+                    verified_from_desc = facility_id_from_desc is not None
                 
-                cursor.execute("UPDATE jobs SET description = ?, facility_name_raw = ?, facility_name_standard = ?, verified_facility = ? WHERE job_id = ?", 
-                             (description, facility_from_desc, standard_from_desc, verified_from_desc, job_id))
+                facility_updates.append((job_id, facility_from_desc, facility_id_from_desc, verified_from_desc))
                 
                 if verified_from_desc:
-                    logger.info(f"Found verified facility in description: {standard_from_desc}")
+                    logger.info(f"Found verified facility in description: {matcher.names[facility_id_from_desc]}")
                 elif facility_from_desc:
                     logger.info(f"Found unverified facility in description: {facility_from_desc}")
-            else:
-                cursor.execute("UPDATE jobs SET description = ? WHERE job_id = ?", (description, job_id))
             
-            conn.commit()
-            
-            time.sleep(2)
+            if len(description_updates) >= DESCRIPTION_BATCH_SIZE:
+                flush_descriptions()
             
         except Exception as e:
             logger.error(f"Error getting description for {job_id}: {e}")
     
+    flush_descriptions()
+    
     # Display results
-    cursor.execute("SELECT job_id, title, location, posted_date, description, facility_name_raw, facility_name_standard, verified_facility FROM jobs")
+    cursor.execute("SELECT job_id, title, location, posted_date, description, facility_name_raw, facility_name_standard, verified_facility FROM job_details")
     jobs = cursor.fetchall()
     
     for job in jobs:
@@ -296,7 +283,7 @@ def scrape_all_jobs():
         print("-" * 80)
     
     # Show verified facilities
-    cursor.execute("SELECT DISTINCT facility_name_standard FROM jobs WHERE verified_facility = 1 ORDER BY facility_name_standard")
+    cursor.execute("SELECT DISTINCT facility_name_standard FROM job_details WHERE verified_facility = 1 ORDER BY facility_name_standard")
     verified_facilities = cursor.fetchall()
     
     # Show unverified facilities
@@ -314,10 +301,33 @@ def scrape_all_jobs():
     logger.info(f"\nVerified facilities: {len(verified_facilities)}")
     logger.info(f"Unverified facilities: {len(unverified_facilities)}")
     logger.info(f"Total jobs scraped: {len(jobs)}")
+    
+    run = dict(
+        timer.columns(),
+        scraper='job_scraper',
+        started_at=started_at,
+        finished_at=now(),
+        status='ok',
+        jobs_found=len(listed_ids),
+        new_jobs=len(new_job_ids),
+        changed_jobs=len(changed_job_ids),
+        descriptions_updated=descriptions_updated,
+        total_jobs=len(jobs),
+        verified_facilities=len(verified_facilities),
+        unverified_facilities=len(unverified_facilities),
+        match_cache_hits=matcher.hits,
+        match_cache_misses=matcher.misses,
+    )
+    with conn:
+        run_id = record_run(conn, run)
+    logger.info(f"Run {run_id} finished in {run['total_s']:.1f}s", extra={'data': dict(run, run_id=run_id)})
     logger.info(f"Log saved to: {log_file}")
     
-    driver.quit()
     conn.close()
 
 if __name__ == "__main__":
-    scrape_all_jobs()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scrape correctional facility jobs from careers.aramark.com with Selenium")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    counted = [(FacilityExtractor, 'extract'), (CachedMatcher, 'match'), (FacilityMatcher, 'match')]
+    run_with_profiling(scrape_all_jobs, 'job_scraper', args, counted=counted)
@@ -1,69 +1,134 @@
-import sqlite3
-from difflib import SequenceMatcher
-
-def load_prison_list():
-    with open('prisons.txt', 'r') as f:
-        content = f.read()
-    
-    prisons = []
-    for line in content.split('\n'):
-        line = line.strip()
-        if line and not line.startswith('List of') and not line.startswith('Department') and line != '':
-            # Clean up the line
-            prison = line.split('(')[0].strip()  # Remove capacity info
-            prison = prison.split(',')[0].strip()  # Remove location info
-            if prison and len(prison) > 5:  # Filter out short entries
-                prisons.append(prison)
-    
-    return prisons
-
-def similarity(a, b):
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
-
-def match_facilities():
-    prisons = load_prison_list()
-    
-    conn = sqlite3.connect('jobs.db')
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT DISTINCT facility_name FROM jobs WHERE facility_name IS NOT NULL")
-    aramark_facilities = [row[0] for row in cursor.fetchall()]
-    
-    matches = []
-    
-    for aramark_facility in aramark_facilities:
-        best_match = None
-        best_score = 0
-        
-        for prison in prisons:
-            score = similarity(aramark_facility, prison)
-            if score > best_score and score > 0.6:  # 60% similarity threshold
-                best_score = score
-                best_match = prison
-        
-        matches.append({
-            'aramark': aramark_facility,
-            'matched_prison': best_match,
-            'score': best_score
-        })
-    
-    # Display results
-    print("=== FACILITY MATCHING RESULTS ===\n")
-    
-    matched_count = 0
-    for match in matches:
-        if match['matched_prison']:
-            print(f"✓ {match['aramark']}")
-            print(f"  → {match['matched_prison']} ({match['score']:.2f})")
-            matched_count += 1
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from database import setup_database, update_facilities
+from facility_catalog import sync_facilities
+from facility_matcher import CachedMatcher, CatalogMatcher, load_catalog, state_from_location
+
+# Names sent to a worker per task; small enough to keep every worker busy
+CHUNK_SIZE = 200
+
+# Below this many names to score, a process pool costs more than it saves
+MIN_POOL_NAMES = 500
+
+_worker_matcher = None
+
+
+def _init_worker(facilities):
+    global _worker_matcher
+    _worker_matcher = CatalogMatcher(facilities)
+
+
+def _match_chunk(names):
+    return [_worker_matcher.match(raw, state or None) for raw, state in names]
+
+
+def match_names(facilities, names, workers=None, chunk_size=CHUNK_SIZE):
+    """Match (facility_name_raw, state) pairs against catalog rows.
+
+    The names are split into chunks scored by a pool of worker processes,
+    each building its own CatalogMatcher once. Returns {(raw, state):
+    (facility_id, score)}.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(names) < MIN_POOL_NAMES:
+        matcher = CatalogMatcher(facilities)
+        return {(raw, state): matcher.match(raw, state or None) for raw, state in names}
+    chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(facilities,)) as executor:
+        for chunk, matches in zip(chunks, executor.map(_match_chunk, chunks)):
+            results.update(zip(chunk, matches))
+    return results
+
+
+def verification_counts(conn):
+    """(verified jobs, verified facilities, unverified raw names)."""
+    verified_jobs, verified_facilities = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT facility_id) FROM jobs WHERE verified_facility = 1").fetchone()
+    unverified, = conn.execute(
+        "SELECT COUNT(DISTINCT facility_name_raw) FROM jobs WHERE verified_facility = 0 AND facility_name_raw IS NOT NULL").fetchone()
+    return verified_jobs, verified_facilities, unverified
+
+
+def rematch_jobs(conn, workers=None, use_cache=True):
+    """Re-match every job's extracted facility name against the catalog.
+
+    The catalog is rebuilt first if prisons.txt changed, which also clears
+    the match cache. Each distinct (raw name, state) is scored once, and
+    only jobs whose facility_id or verified_facility changed are written.
+    Nothing is committed, so the caller can roll the whole re-match back.
+    Returns a dict of counts: names, scored, and jobs verified, reassigned
+    and unverified compared with before the catalog rebuild.
+    """
+    previous = {job_id: (facility_id, bool(verified)) for job_id, facility_id, verified
+                in conn.execute("SELECT job_id, facility_id, verified_facility FROM jobs")}
+    catalog_hash, _ = sync_facilities(conn)
+    matcher = CachedMatcher(conn, catalog_hash)
+
+    jobs = conn.execute('''
+    SELECT job_id, facility_name_raw, location, facility_id, verified_facility
+    FROM jobs WHERE facility_name_raw IS NOT NULL
+    ''').fetchall()
+    keys = {job_id: CachedMatcher.key(raw, state_from_location(location)) for job_id, raw, location, _, _ in jobs}
+    names = sorted(set(keys.values()))
+
+    results = {}
+    to_score = []
+    for key in names:
+        result = matcher.cached(*key) if use_cache else None
+        if result is None:
+            to_score.append(key)
         else:
-            print(f"✗ {match['aramark']}")
-            print(f"  → No match found")
-        print()
-    
-    print(f"Matched: {matched_count}/{len(aramark_facilities)} facilities")
-    
-    conn.close()
+            results[key] = result
+    scored = match_names(load_catalog(conn), to_score, workers)
+    matcher.add(scored)
+    results.update(scored)
+
+    counts = dict(names=len(names), scored=len(to_score), verified=0, reassigned=0, unverified=0)
+    changes = []
+    for job_id, raw, location, facility_id, verified in jobs:
+        new_id, score = results[keys[job_id]]
+        if (new_id, new_id is not None) != (facility_id, bool(verified)):
+            changes.append((job_id, raw, new_id, new_id is not None))
+        old_id, old_verified = previous[job_id]
+        if new_id is None:
+            counts['unverified'] += old_verified
+        elif not old_verified or old_id is None:
+            counts['verified'] += 1
+        elif new_id != old_id:
+            counts['reassigned'] += 1
+
+    matcher.save()
+    update_facilities(conn, changes)
+    return counts
+
 
 if __name__ == "__main__":
-    match_facilities()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Re-match every job's facility name against the facilities catalog "
+                                                 "(rebuilt from prisons.txt if it changed)")
+    parser.add_argument('--workers', type=int, default=None, help="matching processes (default: one per CPU)")
+    parser.add_argument('--no-cache', action='store_true', help="re-score names already in the match cache")
+    parser.add_argument('--dry-run', action='store_true', help="report changes without saving them")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    conn = setup_database()
+    before = verification_counts(conn)
+    counts = rematch_jobs(conn, args.workers, use_cache=not args.no_cache)
+    after = verification_counts(conn)
+    if args.dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+    elapsed = time.perf_counter() - start
+
+    print(f"=== FACILITY RE-MATCH{' (DRY RUN)' if args.dry_run else ''} ===")
+    print(f"Names: {counts['names']} distinct, {counts['scored']} scored, {counts['names'] - counts['scored']} from cache")
+    print(f"Jobs changed: {counts['verified']} verified, {counts['reassigned']} reassigned, {counts['unverified']} unverified")
+    print(f"{'':<22} {'before':>8} {'after':>8}")
+    for label, old, new in zip(('Verified jobs', 'Verified facilities', 'Unverified names'), before, after):
+        print(f"{label:<22} {old:>8} {new:>8}")
+    print(f"Run time: {elapsed:.1f}s")
+    conn.close()
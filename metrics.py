@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+LOG_DIR = 'logs'
+LOG_FILE = os.path.join(LOG_DIR, 'scraper.jsonl')
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 5 * 1024 * 1024))
+LOG_BACKUPS = int(os.environ.get('LOG_BACKUPS', 5))
+
+# Phases timed per run, each stored as <phase>_s in the runs table
+PHASES = ('listing_fetch', 'extraction', 'matching', 'db_write', 'description_fetch', 'export')
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record, tagged with the scraper that wrote it.
+
+    Anything passed as extra={'data': {...}} is merged into the object.
+    """
+
+    def __init__(self, scraper):
+        super().__init__()
+        self.scraper = scraper
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+            'scraper': self.scraper,
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'data', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(scraper, log_file=LOG_FILE):
+    """Log to the console and to the shared rotating JSON-lines log."""
+    os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+    file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding='utf-8')
+    file_handler.setFormatter(JsonLinesFormatter(scraper))
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[file_handler, logging.StreamHandler()]
+    )
+    return log_file
+
+
+class PhaseTimer:
+    """Accumulates wall time per phase across a run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def timed(self, iterable, name):
+        """Iterate, charging only the time spent waiting on the iterable."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.seconds[name] += time.perf_counter() - start
+                return
+            self.seconds[name] += time.perf_counter() - start
+            yield item
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def columns(self):
+        """Phase timings as runs table columns."""
+        columns = {f'{name}_s': round(seconds, 3) for name, seconds in self.seconds.items()}
+        columns['total_s'] = round(self.total(), 3)
+        return columns
@@ -0,0 +1,140 @@
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from datetime import datetime
+from metrics import LOG_DIR
+
+logger = logging.getLogger(__name__)
+
+# Profiling can also be switched on without arguments, e.g. in the workflow:
+# SCRAPER_PROFILE=cpu,memory SCRAPER_COUNT_CALLS=1
+PROFILE_ENV = 'SCRAPER_PROFILE'
+COUNT_CALLS_ENV = 'SCRAPER_COUNT_CALLS'
+PROFILE_MODES = ('cpu', 'memory')
+
+# Rows shown per section of the report
+REPORT_TOP = 40
+
+
+class CallCounter:
+    """Temporarily wraps attributes of modules or classes to count calls
+    and the time spent in them."""
+
+    def __init__(self, targets):
+        self.targets = targets
+        self.calls = {}
+        self.seconds = {}
+        self._originals = []
+
+    def __enter__(self):
+        for owner, name in self.targets:
+            original = getattr(owner, name)
+            label = f"{getattr(owner, '__name__', owner)}.{name}"
+            self.calls[label] = 0
+            self.seconds[label] = 0.0
+            setattr(owner, name, self._wrap(original, label))
+            self._originals.append((owner, name, original))
+        return self
+
+    def __exit__(self, *exc):
+        for owner, name, original in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+
+    def _wrap(self, func, label):
+        @functools.wraps(func)
+        def counted(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.calls[label] += 1
+                self.seconds[label] += time.perf_counter() - start
+        return counted
+
+    def report(self):
+        lines = [f"{'calls':>10} {'total s':>10} {'per call us':>12}  function"]
+        for label in sorted(self.calls, key=self.seconds.get, reverse=True):
+            calls, seconds = self.calls[label], self.seconds[label]
+            per_call = seconds / calls * 1e6 if calls else 0
+            lines.append(f"{calls:>10} {seconds:>10.3f} {per_call:>12.1f}  {label}")
+        return '\n'.join(lines)
+
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', default=os.environ.get(PROFILE_ENV, ''),
+                        help="comma-separated profilers to run: cpu (cProfile), memory (tracemalloc)")
+    parser.add_argument('--count-calls', action='store_true', default=bool(os.environ.get(COUNT_CALLS_ENV)),
+                        help="count calls and time in the extraction, matching and cleaning functions")
+
+
+def run_with_profiling(func, scraper, args, counted=(), report_dir=LOG_DIR):
+    """Run func under the profilers selected by args (see add_profile_arguments)
+    and write a hotspot / peak-memory report to report_dir. Without any
+    profiling selected func is simply called."""
+    modes = {mode.strip() for mode in args.profile.split(',') if mode.strip()}
+    unknown = modes - set(PROFILE_MODES)
+    if unknown:
+        raise ValueError(f"Unknown profile mode(s): {', '.join(sorted(unknown))}")
+    if not modes and not args.count_calls:
+        return func()
+
+    profiler = cProfile.Profile() if 'cpu' in modes else None
+    counter = CallCounter(counted if args.count_calls else ())
+    if 'memory' in modes:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with counter:
+            if profiler:
+                profiler.enable()
+            try:
+                return func()
+            finally:
+                if profiler:
+                    profiler.disable()
+    finally:
+        elapsed = time.perf_counter() - start
+        sections = [f"{scraper} profile, {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, {elapsed:.2f}s wall"]
+        if profiler:
+            sections.append(cpu_report(profiler))
+        if 'memory' in modes:
+            sections.append(memory_report())
+            tracemalloc.stop()
+        if args.count_calls:
+            sections.append("=== Call counters ===\n" + counter.report())
+
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(report_dir, f"profile_{scraper}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(sections) + '\n')
+        logger.info(f"Profile report saved to: {path}")
+
+
+def cpu_report(profiler):
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs()
+    out.write("=== Hotspots by own time ===\n")
+    stats.sort_stats('tottime').print_stats(REPORT_TOP)
+    out.write("=== Hotspots by cumulative time ===\n")
+    stats.sort_stats('cumulative').print_stats(REPORT_TOP)
+    return out.getvalue().rstrip()
+
+
+def memory_report():
+    current, peak = tracemalloc.get_traced_memory()
+    lines = [
+        "=== Memory ===",
+        f"Peak traced memory: {peak / 1024 / 1024:.1f} MB",
+        f"Still allocated at end: {current / 1024 / 1024:.1f} MB",
+        f"Top {REPORT_TOP} allocation sites still live:",
+    ]
+    for stat in tracemalloc.take_snapshot().statistics('lineno')[:REPORT_TOP]:
+        lines.append(f"  {stat}")
+    return '\n'.join(lines)
@@ -0,0 +1,116 @@
+import argparse
+import re
+import sqlite3
+import time
+from database import connect
+from facility_matcher import STATE_NAMES, normalize_state
+
+# bm25 weights for the title, facility and description columns of jobs_fts
+RANK_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Words of context around each highlighted match in a snippet
+SNIPPET_TOKENS = 16
+
+_STATE_CODES = {name: code for code, name in STATE_NAMES.items()}
+
+
+def fts_query(text):
+    """FTS5 query matching every word of text, in any column.
+
+    Words are quoted so punctuation such as "Co-op" or "AT&T" is searched
+    for instead of being parsed as query syntax; a trailing * keeps prefix
+    search ("supervis*").
+    """
+    terms = []
+    for word in re.findall(r'[^\s"]+', text):
+        prefix = word.endswith('*')
+        word = word.rstrip('*')
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return ' '.join(terms)
+
+
+def search_jobs(conn, query, verified=None, state=None, since=None, until=None, open_only=False,
+                limit=20, offset=0, raw=False):
+    """Jobs matching a full-text query, best first.
+
+    query is plain words unless raw, in which case it is passed to FTS5
+    as is (phrases, OR, NEAR, column filters). Filters: verified (True or
+    False), state (code or name, matched against the "City, ST"
+    location), posted_date between since and until (YYYY-MM-DD,
+    inclusive) and open_only for jobs not closed. Returns dicts with the
+    job fields, rank and highlighted title and description snippet.
+    """
+    conditions = ["jobs_fts MATCH ?"]
+    params = [query if raw else fts_query(query)]
+    if verified is not None:
+        conditions.append("j.verified_facility = ?")
+        params.append(1 if verified else 0)
+    if state:
+        name = normalize_state(state)
+        if name is None:
+            raise ValueError(f"Unknown state: {state}")
+        conditions.append("(j.location LIKE ? OR j.location LIKE ?)")
+        params.extend((f"%, {_STATE_CODES[name]}", f"%, {name}"))
+    if since:
+        conditions.append("j.posted_date >= ?")
+        params.append(since)
+    if until:
+        conditions.append("j.posted_date <= ?")
+        params.append(until)
+    if open_only:
+        conditions.append("j.closed_at IS NULL")
+
+    cursor = conn.execute(f'''
+    SELECT j.job_id, j.title, j.url, j.location, j.posted_date, j.facility_name_raw,
+           f.name, j.verified_facility, j.closed_at,
+           bm25(jobs_fts, {', '.join(map(str, RANK_WEIGHTS))}) AS rank,
+           highlight(jobs_fts, 0, '[', ']'),
+           snippet(jobs_fts, 2, '[', ']', '...', {SNIPPET_TOKENS})
+    FROM jobs_fts
+    JOIN jobs j ON j.rowid = jobs_fts.rowid
+    LEFT JOIN facilities f ON f.id = j.facility_id
+    WHERE {' AND '.join(conditions)}
+    ORDER BY rank
+    LIMIT ? OFFSET ?
+    ''', params + [limit, offset])
+    columns = ('job_id', 'title', 'url', 'location', 'posted_date', 'facility_name_raw',
+               'facility_name_standard', 'verified_facility', 'closed_at', 'rank', 'title_highlight', 'snippet')
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-text search over job titles, facilities and descriptions")
+    parser.add_argument('query', help='words to search for, e.g. "food service director" (a trailing * matches prefixes)')
+    parser.add_argument('--raw', action='store_true', help="pass the query to FTS5 as is (\"phrases\", OR, NOT, NEAR, title: ...)")
+    verified = parser.add_mutually_exclusive_group()
+    verified.add_argument('--verified', dest='verified', action='store_const', const=True, help="only verified facilities")
+    verified.add_argument('--unverified', dest='verified', action='store_const', const=False, help="only unverified facilities")
+    parser.add_argument('--state', help="state code or name, e.g. TX")
+    parser.add_argument('--since', help="posted on or after YYYY-MM-DD")
+    parser.add_argument('--until', help="posted on or before YYYY-MM-DD")
+    parser.add_argument('--open', action='store_true', help="only jobs that are still listed")
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--offset', type=int, default=0)
+    args = parser.parse_args()
+
+    conn = connect()
+    start = time.perf_counter()
+    try:
+        results = search_jobs(conn, args.query, verified=args.verified, state=args.state, since=args.since,
+                              until=args.until, open_only=args.open, limit=args.limit, offset=args.offset, raw=args.raw)
+    except (ValueError, sqlite3.OperationalError) as e:
+        parser.error(str(e))
+    elapsed = (time.perf_counter() - start) * 1000
+
+    for result in results:
+        facility = result['facility_name_standard'] or result['facility_name_raw'] or 'No facility found'
+        print(f"\n{result['title_highlight']}")
+        print(f"  {result['job_id']} | {result['location']} | posted {result['posted_date']} | "
+              f"{'✓' if result['verified_facility'] else '?'} {facility}"
+              f"{' | closed ' + result['closed_at'] if result['closed_at'] else ''}")
+        if result['snippet']:
+            print(f"  {' '.join(result['snippet'].split())}")
+        print(f"  {result['url']}")
+    print(f"\n{len(results)} results in {elapsed:.1f} ms")
+    conn.close()
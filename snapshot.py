@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import re
+from database import DB_PATH, add_missing_columns, decode_description, encode_description, queue_missing_descriptions, rebuild_search_index, setup_database
+
+SNAPSHOT_DIR = 'snapshot'
+SNAPSHOT_FORMAT = 1
+
+# Inline descriptions were moved to the descriptions table, so this column
+# is always empty and is left out of the snapshot
+SKIPPED_COLUMNS = ('description',)
+
+# Jobs in snapshots written before the facilities catalog name their
+# facility as text; the column is recreated on restore so the next
+# sync_facilities can move them onto the catalog
+LEGACY_JOB_COLUMNS = {
+    'facility_name_standard': 'TEXT',
+}
+
+# Rows inserted per executemany call when restoring
+RESTORE_BATCH_SIZE = 1000
+
+
+def shard_for_location(location):
+    """Shard name for a job: the state part of "City, ST", else _unknown."""
+    state = location.rsplit(',', 1)[-1] if location and ',' in location else ''
+    return re.sub(r'[^A-Za-z0-9]+', '_', state).strip('_').upper() or '_unknown'
+
+
+def dump_line(record):
+    return json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def iter_grouped(cursor):
+    """Group a cursor ordered by its first column into (key, rows)."""
+    key, rows = None, []
+    for row in cursor:
+        if rows and row[0] != key:
+            yield key, rows
+            rows = []
+        key = row[0]
+        rows.append(row)
+    if rows:
+        yield key, rows
+
+
+def write_file_if_changed(path, text):
+    data = text.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def write_shards(directory, shards):
+    """Write (name, text) shards to directory/name.ndjson, touching only
+    files whose content changed, and delete shards no longer produced.
+    Returns the number of files written or deleted."""
+    os.makedirs(directory, exist_ok=True)
+    names = set()
+    changed = 0
+    for name, text in shards:
+        names.add(f"{name}.ndjson")
+        changed += write_file_if_changed(os.path.join(directory, f"{name}.ndjson"), text)
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.ndjson') and entry.name not in names:
+            os.remove(entry.path)
+            changed += 1
+    return changed
+
+
+def write_snapshot(conn, directory=SNAPSHOT_DIR):
+    """Write jobs.db as stable-sorted NDJSON shards under directory.
+
+    Jobs are sharded by state and sorted by job_id; descriptions are
+    sharded by the first character of their hash, and the facilities
+    catalog, match cache, description queue, meta table and runs go to
+    single facilities.ndjson, facility_matches.ndjson,
+    description_queue.ndjson, db_meta.ndjson and runs.ndjson files. The
+    meta table carries the catalog hash, so a restored database neither
+    rebuilds the catalog nor loses its match cache. Only one shard is held
+    in memory at a time. last_seen is omitted for jobs seen in the latest
+    run and stored once in meta.json instead, so a routine run only
+    rewrites shards where something actually changed. Returns the number of files written or deleted.
+    """
+    conn.create_function('snapshot_shard', 1, shard_for_location, deterministic=True)
+    last_seen, = conn.execute("SELECT MAX(last_seen) FROM jobs").fetchone()
+
+    cursor = conn.execute("SELECT snapshot_shard(location) AS shard, * FROM jobs ORDER BY shard, job_id")
+    columns = [description[0] for description in cursor.description]
+    kept = [(i, name) for i, name in enumerate(columns) if i > 0 and name not in SKIPPED_COLUMNS]
+
+    def job_shards():
+        for shard, rows in iter_grouped(cursor):
+            lines = []
+            for row in rows:
+                record = {name: row[i] for i, name in kept}
+                if record['last_seen'] == last_seen:
+                    del record['last_seen']
+                lines.append(dump_line(record))
+            yield shard, ''.join(lines)
+
+    changed = write_shards(os.path.join(directory, 'jobs'), job_shards())
+
+    cursor = conn.execute("SELECT substr(hash, 1, 1), hash, body, cleaned_version FROM descriptions ORDER BY hash")
+
+    def description_shards():
+        for prefix, rows in iter_grouped(cursor):
+            yield prefix, ''.join(dump_line({'hash': content_hash, 'text': decode_description(body),
+                                             'cleaned_version': cleaned_version})
+                                  for _, content_hash, body, cleaned_version in rows)
+
+    changed += write_shards(os.path.join(directory, 'descriptions'), description_shards())
+
+    cursor = conn.execute("SELECT id, state, name, tokens, aliases, closed FROM facilities ORDER BY id")
+    changed += write_file_if_changed(os.path.join(directory, 'facilities.ndjson'), ''.join(
+        dump_line({'id': facility_id, 'state': state, 'name': name, 'tokens': tokens,
+                   'aliases': json.loads(aliases or '[]'), 'closed': closed})
+        for facility_id, state, name, tokens, aliases, closed in cursor))
+
+    cursor = conn.execute("SELECT facility_name_raw, state, facility_id, score, master_hash FROM facility_matches "
+                          "ORDER BY facility_name_raw, state")
+    changed += write_file_if_changed(os.path.join(directory, 'facility_matches.ndjson'), ''.join(
+        dump_line({'facility_name_raw': raw, 'state': state, 'facility_id': facility_id, 'score': score,
+                   'master_hash': master_hash})
+        for raw, state, facility_id, score, master_hash in cursor))
+
+    cursor = conn.execute("SELECT key, value FROM meta ORDER BY key")
+    changed += write_file_if_changed(os.path.join(directory, 'db_meta.ndjson'), ''.join(
+        dump_line({'key': key, 'value': value}) for key, value in cursor))
+
+    cursor = conn.execute("SELECT job_id, state, attempts, last_error, updated_at FROM description_queue ORDER BY job_id")
+    changed += write_file_if_changed(os.path.join(directory, 'description_queue.ndjson'), ''.join(
+        dump_line({'job_id': job_id, 'state': state, 'attempts': attempts, 'last_error': last_error, 'updated_at': updated_at})
+        for job_id, state, attempts, last_error, updated_at in cursor))
+
+    # Runs are append-only, so this file only ever grows by new lines
+    cursor = conn.execute("SELECT * FROM runs ORDER BY run_id")
+    run_columns = [description[0] for description in cursor.description]
+    changed += write_file_if_changed(os.path.join(directory, 'runs.ndjson'),
+                                     ''.join(dump_line(dict(zip(run_columns, row))) for row in cursor))
+    changed += write_file_if_changed(os.path.join(directory, 'meta.json'),
+                                     dump_line({'format': SNAPSHOT_FORMAT, 'last_seen': last_seen}))
+    return changed
+
+
+def iter_records(directory):
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.ndjson'):
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def restore_snapshot(directory=SNAPSHOT_DIR, path=DB_PATH):
+    """Rebuild the database at path from a snapshot written by write_snapshot.
+
+    The database is built next to path and moved into place once complete,
+    so an interrupted restore never leaves a half-built jobs.db. Returns
+    the number of jobs restored.
+    """
+    with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+        meta = json.loads(f.read())
+    if meta['format'] != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {meta['format']}")
+
+    tmp_path = f"{path}.restore"
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(tmp_path + suffix):
+            os.remove(tmp_path + suffix)
+
+    conn = setup_database(tmp_path)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)") if row[1] not in SKIPPED_COLUMNS]
+    restored = 0
+    with conn:
+        for batch in batched(iter_records(os.path.join(directory, 'descriptions')), RESTORE_BATCH_SIZE):
+            conn.executemany("INSERT OR IGNORE INTO descriptions (hash, body, cleaned_version) VALUES (?, ?, ?)",
+                             [(record['hash'], encode_description(record['text']), record.get('cleaned_version'))
+                              for record in batch])
+        facilities_path = os.path.join(directory, 'facilities.ndjson')
+        if os.path.exists(facilities_path):
+            with open(facilities_path, encoding='utf-8') as f:
+                facilities = [json.loads(line) for line in f if line.strip()]
+            conn.executemany("INSERT INTO facilities (id, state, name, tokens, aliases, closed) VALUES (?, ?, ?, ?, ?, ?)",
+                             [(record['id'], record['state'], record['name'], record['tokens'],
+                               json.dumps(record['aliases'], ensure_ascii=False), record['closed'])
+                              for record in facilities])
+        for batch in batched(iter_records(os.path.join(directory, 'jobs')), RESTORE_BATCH_SIZE):
+            legacy = {name: declaration for name, declaration in LEGACY_JOB_COLUMNS.items()
+                      if name not in columns and any(name in record for record in batch)}
+            if legacy:
+                add_missing_columns(conn, 'jobs', legacy)
+                columns.extend(legacy)
+            for record in batch:
+                record.setdefault('last_seen', meta['last_seen'])
+            conn.executemany(
+                f"INSERT INTO jobs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [tuple(record.get(name) for name in columns) for record in batch])
+            restored += len(batch)
+        rebuild_search_index(conn)
+        matches_path = os.path.join(directory, 'facility_matches.ndjson')
+        if os.path.exists(matches_path):
+            with open(matches_path, encoding='utf-8') as f:
+                matches = [json.loads(line) for line in f if line.strip()]
+            conn.executemany("INSERT INTO facility_matches (facility_name_raw, state, facility_id, score, master_hash) "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             [(record['facility_name_raw'], record['state'], record['facility_id'], record['score'],
+                               record['master_hash']) for record in matches])
+        db_meta_path = os.path.join(directory, 'db_meta.ndjson')
+        if os.path.exists(db_meta_path):
+            with open(db_meta_path, encoding='utf-8') as f:
+                db_meta = [json.loads(line) for line in f if line.strip()]
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             [(record['key'], record['value']) for record in db_meta])
+        queue_path = os.path.join(directory, 'description_queue.ndjson')
+        if os.path.exists(queue_path):
+            with open(queue_path, encoding='utf-8') as f:
+                queue = [json.loads(line) for line in f if line.strip()]
+            conn.executemany("INSERT INTO description_queue (job_id, state, attempts, last_error, updated_at) VALUES (?, ?, ?, ?, ?)",
+                             [(record['job_id'], record['state'], record['attempts'], record['last_error'], record['updated_at'])
+                              for record in queue])
+        else:
+            # Snapshots from before the queue: queue what is still missing
+            queue_missing_descriptions(conn)
+        runs_path = os.path.join(directory, 'runs.ndjson')
+        if os.path.exists(runs_path):
+            run_columns = [row[1] for row in conn.execute("PRAGMA table_info(runs)")]
+            with open(runs_path, encoding='utf-8') as f:
+                runs = [json.loads(line) for line in f if line.strip()]
+            conn.executemany(
+                f"INSERT INTO runs ({', '.join(run_columns)}) VALUES ({', '.join('?' * len(run_columns))})",
+                [tuple(run.get(name) for name in run_columns) for run in runs])
+    conn.close()
+
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    os.replace(tmp_path, path)
+    return restored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write jobs.db as NDJSON shards, or rebuild it from them")
+    parser.add_argument('command', choices=('write', 'restore'))
+    parser.add_argument('--dir', default=SNAPSHOT_DIR)
+    parser.add_argument('--db', default=DB_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'write':
+        conn = setup_database(args.db)
+        changed = write_snapshot(conn, args.dir)
+        conn.close()
+        print(f"Snapshot written to {args.dir}/ ({changed} files changed)")
+    else:
+        restored = restore_snapshot(args.dir, args.db)
+        print(f"Restored {restored} jobs from {args.dir}/ into {args.db}")
@@ -1,9 +1,9 @@
-import requests
 import json
+from http_client import get_session
 
 url = "https://careers.aramark.com/wp-json/aramark/jobs?&path=&zips=&industries=correctional%20facilities&categories=&jobfunction=&sub_categories=&types=&keyword=&limit=100"
 
-response = requests.get(url)
+response = get_session().get(url)
 
 print(f"Status Code: {response.status_code}")
 print(f"\nResponse Headers:")
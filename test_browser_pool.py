@@ -0,0 +1,60 @@
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from selenium.common.exceptions import WebDriverException
+import browser_pool
+
+# Serves fixtures/ locally: job pages laid out like the careers site's
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+EXPECTED = {
+    'job1.html': "Lead the food service team at Sample Correctional Facility.",
+    'job2.html': "Prepare meals for residents of Example County Jail.",
+}
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=FIXTURES))
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+# The first browser fails every page load as if Chrome had crashed; the
+# pool has to replace it and still read every page
+started = []
+
+
+def driver_factory():
+    driver = browser_pool.new_driver()
+    if not started:
+        def crashed(url):
+            raise WebDriverException("chrome not reachable")
+        driver.get = crashed
+    started.append(driver)
+    return driver
+
+
+jobs = [(f"{page}#{i}", f"{base_url}/{page}") for i in range(3) for page in EXPECTED]
+jobs.append(('missing.html', f"{base_url}/missing.html"))
+try:
+    results = {job_id: (description, error) for job_id, description, error
+               in browser_pool.fetch_descriptions(jobs, size=2, rate=20, driver_factory=driver_factory, timeout=2)}
+finally:
+    server.shutdown()
+
+for job_id, (description, error) in sorted(results.items()):
+    print(f"{job_id}: {error!r}" if error else f"{job_id}: {' '.join(description.split())[:80]}")
+print(f"Browsers started: {len(started)}")
+
+assert set(results) == {job_id for job_id, _ in jobs}
+for job_id, (description, error) in results.items():
+    page = job_id.split('#')[0]
+    if page in EXPECTED:
+        assert error is None, (job_id, error)
+        assert description.startswith(EXPECTED[page]), (job_id, description)
+assert results['missing.html'][1] is not None
+assert len(started) > 1
+print("OK")
@@ -1,9 +1,9 @@
-import requests
 import json
+from http_client import get_session
 
 url = "https://careers.aramark.com/wp-json/aramark/jobs?limit=10&req_id=614164"
 
-response = requests.get(url)
+response = get_session().get(url)
 
 print(f"Status Code: {response.status_code}")
 